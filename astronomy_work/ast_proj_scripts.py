@@ -1,64 +1,352 @@
+import collections
+import hashlib
+import os
+import queue
+import threading
+
 import astropy.io.fits as fits
 import numpy as np
-from scipy.interpolate import splev, splrep
+from scipy.fft import irfft, rfft
+from scipy.interpolate import BSpline, splev, splrep
+from scipy.sparse.linalg import splu
+
+from astronomy_work.medcombine import normmedcomb
 
 
 def save_fits(filename, data):
     "A helper function for saving FITS files."
-    fits.writeto(filename, np.float32(data), overwrite=True, output_verify='silentfix')
+    fits.writeto(filename, np.asarray(data, dtype=np.float32), overwrite=True, output_verify='silentfix')
+
+
+class FitsWriter:
+    """Writes FITS files from a background thread, so the caller can keep
+    computing while earlier frames go to disk.
+    write() queues an array and returns at once, blocking only when
+    maxqueue writes are already pending, which bounds the memory held.
+    Arrays that are already float32 are written without a copy, so they
+    must not be modified after being queued.  New files are written
+    under a temporary name and renamed when complete.  An error in the
+    thread is raised by the next write() or by close(); writes still
+    pending are dropped, and any write() after it raises RuntimeError.
+    Accepts:
+    maxqueue: int, maximum number of pending writes
+    compress: False, True or a compression type ('RICE_1' if True) for
+    tile-compressed images
+    Usage:
+    with FitsWriter() as writer:
+        for name, frame in frames:
+            writer.write(name, frame)"""
+
+    def __init__(self, maxqueue=4, compress=False):
+        self.compress = 'RICE_1' if compress is True else compress
+        self._queue = queue.Queue(maxqueue)
+        self._error = None
+        self._reported = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, filename, data, header=None, append=False):
+        """Queue data to be written to filename, replacing the file, or
+        as a new HDU at the end of it if append is true."""
+        self._raise(again=True)
+        self._queue.put((filename, np.asarray(data, dtype=np.float32), header, append))
+
+    def close(self):
+        """Wait for the pending writes and stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _raise(self, again=False):
+        # the error once, then (if again) a refusal for every later write
+        if self._error is None:
+            return
+        if not self._reported:
+            self._reported = True
+            raise self._error
+        if again:
+            raise RuntimeError("FitsWriter: an earlier write failed") from self._error
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is None:
+                try:
+                    self._write(*item)
+                except Exception as e:
+                    self._error = e
+
+    def _write(self, filename, data, header, append):
+        append = append and os.path.exists(filename)
+        if self.compress:
+            hdu = fits.CompImageHDU(data, header, compression_type=self.compress)
+            if append:
+                with fits.open(filename, mode='append') as hdul:
+                    hdul.append(hdu)
+                return
+            hdul = fits.HDUList([fits.PrimaryHDU(), hdu])
+        elif append:
+            fits.append(filename, data, header, verify=False)
+            return
+        else:
+            hdul = fits.PrimaryHDU(data, header)
+        # new files appear complete or not at all
+        hdul.writeto(filename + '.part', overwrite=True, output_verify='silentfix')
+        os.replace(filename + '.part', filename)
 
 
-def cross_corr(f, g, shifts=None):
+def cross_corr(f, g, shifts=None, dtype=float):
     """Cross correlation function.
     Accepts:
     f, g: array_like
     shifts: array_like
+    dtype: precision of the computation, e.g. np.float32
     Returns:
     c: array_like, correlation values."""
+
+    c = cross_corr_batch(np.atleast_2d(f), g, shifts, dtype)
+
+    return c[0]
+
+
+def cross_corr_batch(f, g, shifts=None, dtype=float):
+    """Cross correlation of many spectra against one template, via FFT.
+    Gives the same values as correlating each zero-padded row of f with
+    the zero-padded g rolled by each shift, in O(N log N) per row.
+    Accepts:
+    f: array_like, 2D, one spectrum per row
+    g: array_like, 1D template
+    shifts: array_like, integer shifts (default: 0 to len(g) - 1)
+    dtype: precision of the computation, e.g. np.float32
+    Returns:
+    c: array_like, 2D, correlation values, one row per spectrum."""
+    f = np.asarray(f, dtype=dtype)
+    g = np.asarray(g, dtype=dtype)
     if shifts is None:
         shifts = np.arange(len(g))
-    c = np.zeros(len(shifts), dtype=float)
-    f_pad = np.zeros(3 * len(f))
-    g_pad = np.zeros(3 * len(f))
-    f_pad[len(f): 2 * len(f)] = f - f.mean()
+    n = f.shape[1]
+    f_pad = np.zeros((f.shape[0], 3 * n), dtype=dtype)
+    g_pad = np.zeros(3 * n, dtype=dtype)
+    f_pad[:, n: 2 * n] = f - f.mean(axis=1, keepdims=True)
     g_pad[len(g): 2 * len(g)] = g - g.mean()
-    for i in range(len(shifts)):
-        c[i] = np.correlate(f_pad, np.roll(g_pad, -shifts[i]))
+
+    # circular correlation of the padded arrays, sum(f_pad[i] * g_pad[i + s])
+    corr = irfft(np.conj(rfft(f_pad, axis=1)) * rfft(g_pad), n=3 * n, axis=1)
+    c = corr[:, np.asarray(shifts) % (3 * n)]
 
     return c
 
 
 def wavelength_shift(in_pixel, ref_pixel, ref_wavelength, dispersion):
     """A helper function for determining wavelength shift.
-    Accepts a pixel to be determined, a reference pixel, and the dispersion value."""
+    Accepts a pixel to be determined, a reference pixel, and the dispersion value.
+    Pixels may be scalars or arrays, for many shifts at once."""
 
-    pixel_diff = in_pixel - ref_pixel
+    pixel_diff = np.asarray(in_pixel) - np.asarray(ref_pixel)
     wavelength = pixel_diff * dispersion
 
     return wavelength
 
 
-def norm_med_comb(data, region=((None, None), (None, None))):
-    """Function implementing normalized median combination."""
-    ((y1, x1), (y2, x2)) = region
+def peak_position(c, shifts=None, method='parabolic'):
+    """Sub-pixel position of the maximum of each correlation curve.
+    Fits a parabola through the highest point and its two neighbours
+    ('parabolic'), or a parabola through their logarithms ('gaussian',
+    falling back to 'parabolic' where a value is not positive).  Peaks
+    on the first or last point are not refined.
+    Accepts:
+    c: array_like, 1D or 2D, one correlation curve per row
+    shifts: array_like, evenly spaced shifts of the columns of c (default: 0 to N - 1)
+    method: 'parabolic' or 'gaussian'
+    Returns:
+    peak: float or array_like, peak position(s) in units of shifts."""
+    if method not in ('parabolic', 'gaussian'):
+        raise ValueError("method must be 'parabolic' or 'gaussian'.")
+    c = np.asarray(c)
+    if not np.issubdtype(c.dtype, np.floating):
+        c = c.astype(float)
+    c2 = np.atleast_2d(c)
+    n = c2.shape[1]
+    if shifts is None:
+        shifts = np.arange(n)
+    shifts = np.asarray(shifts, dtype=c.dtype)
+
+    rows = np.arange(c2.shape[0])
+    ipeak = c2.argmax(axis=1)
+    peak = shifts[ipeak]
+    if n < 3:
+        return peak if c.ndim > 1 else peak[0]
+
+    # three points around each peak; edge peaks get delta = 0 below
+    icen = np.clip(ipeak, 1, n - 2)
+    y0 = c2[rows, icen - 1]
+    y1 = c2[rows, icen]
+    y2 = c2[rows, icen + 1]
+    if method == 'gaussian':
+        pos = (y0 > 0) & (y1 > 0) & (y2 > 0)
+        y0 = np.where(pos, np.log(np.where(pos, y0, 1)), y0)
+        y1 = np.where(pos, np.log(np.where(pos, y1, 1)), y1)
+        y2 = np.where(pos, np.log(np.where(pos, y2, 1)), y2)
 
-    num_frames = data.shape[0]
-    norm_factors = np.zeros(num_frames)
-    norm_data = data.copy()
+    # vertex of the parabola, only where it is a maximum
+    denom = y0 - 2 * y1 + y2
+    fit = (denom < 0) & (icen == ipeak)
+    delta = np.where(fit, (y0 - y2) / (2 * np.where(fit, denom, -1)), 0).astype(c.dtype)
+    peak = peak + delta * (shifts[1] - shifts[0])
 
-    for frame in range(num_frames):
-        norm_factors[frame] = np.median(norm_data[frame, y1:y2, x1:x2])
-        norm_data[frame] /= norm_factors[frame]
+    return peak if c.ndim > 1 else peak[0]
 
-    med_comb_data = np.median(norm_data, axis=0)
+
+def spectra_wavelength_shift(f, g, dispersion, shifts=None, method='parabolic', ref_pixel=0.,
+                             dtype=float):
+    """Wavelength shift of many spectra relative to a template.
+    Cross-correlates every row of f against g, finds the sub-pixel
+    correlation peaks and converts them to wavelength.  A peak at
+    shift s means f[i] matches g[i + s], i.e. f is shifted by -s pixels.
+    Accepts:
+    f: array_like, 2D, one spectrum per row
+    g: array_like, 1D template
+    dispersion: wavelength per pixel
+    shifts: array_like, evenly spaced integer shifts (default: -N/2 to N/2)
+    method: 'parabolic' or 'gaussian', see peak_position()
+    ref_pixel: pixel shift that counts as zero wavelength shift
+    dtype: precision of the computation, e.g. np.float32
+    Returns:
+    wavelength: array_like, one wavelength shift per spectrum."""
+    if shifts is None:
+        n = len(g)
+        shifts = np.arange(-(n // 2), n // 2 + 1)
+
+    c = cross_corr_batch(f, g, shifts, dtype)
+    peak = peak_position(c, shifts, method)
+    wavelength = wavelength_shift(-peak, ref_pixel, None, dispersion)
+
+    return wavelength
+
+
+def norm_med_comb(data, region=((None, None), (None, None)), method='median', nproc=1, dtype=None):
+    """Function implementing normalized median combination.
+    Accepts the same data, method, nproc and dtype as medcombine.normmedcomb()."""
+
+    med_comb_data, norm_factors = normmedcomb(data, region, method=method, nproc=nproc, dtype=dtype)
 
     return med_comb_data, norm_factors
 
 
-def splinterp(x_new, x_old, y_old):
-    """Function implementing spline interpolation."""
+class SplineCache:
+    """Cache of spline representations for splinterp().
+    Keeps the (t, c, k) tuples from splrep() for each (x_old, y_old),
+    and a resampler for each (x_new, x_old) pair, under LRU lists keyed
+    by a fingerprint of the array contents.  With s=0 the knots depend
+    only on x_old, so spectra that share x_old are resampled together:
+    one sparse LU solve with the banded B-spline basis at x_old gives
+    all their coefficients, and the sparse basis at x_new evaluates
+    them, O(len(x_old)) per spectrum.
+    Accepts:
+    maxsize: int, number of entries kept in each LRU list"""
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._tcks = collections.OrderedDict()
+        self._resamplers = collections.OrderedDict()
+
+    def tck(self, x_old, y_old):
+        """The splrep() representation of (x_old, y_old)."""
+        key = _fingerprint(x_old, y_old)
+        tck = _lru_get(self._tcks, key)
+        if tck is None:
+            tck = splrep(x_old, y_old)
+            _lru_put(self._tcks, key, tck, self.maxsize)
+        return tck
+
+    def resampler(self, x_new, x_old):
+        """(lu, basis_new) for resampling from x_old to x_new: the sparse
+        LU factorization of the B-spline basis at x_old, which turns
+        values at x_old into spline coefficients, and the sparse (CSR)
+        basis at x_new, which evaluates them.  Both have k + 1 nonzeros
+        per row."""
+        key = _fingerprint(x_new, x_old)
+        res = _lru_get(self._resamplers, key)
+        if res is None:
+            x_old = np.asarray(x_old, dtype=float)
+            t, c, k = splrep(x_old, np.zeros_like(x_old))
+            lu = splu(BSpline.design_matrix(x_old, t, k).tocsc())
+            basis_new = BSpline.design_matrix(np.asarray(x_new, dtype=float), t, k,
+                                              extrapolate=True).tocsr()
+            res = (lu, basis_new)
+            _lru_put(self._resamplers, key, res, self.maxsize)
+        return res
+
+    def __call__(self, x_new, x_old, y_old, dtype=None):
+        """Spline interpolation of one spectrum (y_old 1D) or of a batch
+        sharing x_old (y_old 2D, one spectrum per row).  A batch is
+        resampled in double precision and returned as dtype (default:
+        that of y_old, float64 if it is not floating point)."""
+        y_old = np.asarray(y_old)
+        if y_old.ndim == 1:
+            y_new = splev(x_new, self.tck(x_old, y_old))
+            return y_new if dtype is None else y_new.astype(dtype)
+        if dtype is None:
+            dtype = y_old.dtype if np.issubdtype(y_old.dtype, np.floating) else float
+        lu, basis_new = self.resampler(x_new, x_old)
+        coeffs = lu.solve(np.asarray(y_old, dtype=float).T)
+        return (basis_new @ coeffs).T.astype(dtype)
+
+    def clear(self):
+        """Empty the cache."""
+        self._tcks.clear()
+        self._resamplers.clear()
+
+
+def _fingerprint(*arrays):
+    "A key for the contents, dtype and shape of some arrays."
+    digest = hashlib.blake2b(digest_size=16)
+    for a in arrays:
+        a = np.ascontiguousarray(a)
+        digest.update(str((a.dtype.str, a.shape)).encode())
+        digest.update(a)
+    return digest.digest()
+
+
+def _lru_get(cache, key):
+    "Look up key in an OrderedDict used as an LRU list, or return None."
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+
+def _lru_put(cache, key, value, maxsize):
+    "Store value in an OrderedDict used as an LRU list of maxsize entries."
+    cache[key] = value
+    if len(cache) > maxsize:
+        cache.popitem(last=False)
+
+
+def splinterp(x_new, x_old, y_old, cache=None, dtype=None):
+    """Function implementing spline interpolation.
+    y_old may be 2D, one spectrum per row, all sharing x_old.
+    Pass a SplineCache as cache to reuse spline representations and
+    resamplers between calls.  dtype sets the type of the
+    result, see SplineCache."""
+
+    if cache is None and np.ndim(y_old) > 1:
+        cache = SplineCache()
+    if cache is not None:
+        return cache(x_new, x_old, y_old, dtype)
 
     spline = splrep(x_old, y_old)
     y_new = splev(x_new, spline)
+    if dtype is not None:
+        y_new = y_new.astype(dtype)
 
     return y_new
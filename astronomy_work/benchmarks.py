@@ -0,0 +1,267 @@
+'''
+Timing and peak-memory benchmarks of the astronomy hot paths, on
+synthetic data of several sizes:
+  makestack()
+  makespectra()
+  makestamps()
+  measure()
+  runsuite()
+
+Run as a script to print (and optionally save) the numbers:
+  python -m astronomy_work.benchmarks [--size small medium] [--json out.json]
+'''
+
+import argparse
+import json
+import time
+import timeit
+import tracemalloc
+
+import numpy as np
+
+from astronomy_work import ast_proj_scripts as aps
+from astronomy_work import gaussian as g
+from astronomy_work import medcombine as mc
+
+
+def makestack(nframes, ny, nx, sky=1000., seed=0, dtype=float):
+    """
+      A stack of sky frames with a few stars and Poisson-like noise,
+      each frame scaled by a random factor as in a night of varying
+      sky, ready for normmedcomb().
+    """
+    rng = np.random.default_rng(seed)
+    y, x = np.indices((ny, nx))
+    scene = np.full((ny, nx), sky)
+    for cy, cx, h in zip(rng.uniform(0, ny, 20), rng.uniform(0, nx, 20),
+                         rng.uniform(100., 5000., 20)):
+        scene += h * np.exp(-0.5 * ((y - cy) ** 2 + (x - cx) ** 2) / 2. ** 2)
+    # frame by frame, so a large float32 stack has no float64 copy
+    stack = np.empty((nframes, ny, nx), dtype=dtype)
+    for frame, scale in zip(stack, rng.uniform(0.8, 1.2, nframes)):
+        frame[:] = scene * scale + rng.normal(size=scene.shape) * np.sqrt(scene * scale)
+    return stack
+
+
+def makespectra(nspec, npix, shift=3.3, seed=0, dtype=float):
+    """
+      A template spectrum of absorption lines and nspec noisy copies
+      of it shifted by shift pixels, for cross_corr() and
+      spectra_wavelength_shift().
+    """
+    rng = np.random.default_rng(seed)
+    pix = np.arange(npix, dtype=float)
+    centers = rng.uniform(0, npix, max(npix // 50, 1))
+    depths = rng.uniform(0.1, 0.8, len(centers))
+
+    def spectrum(offset, sigma=2.):
+        # each line only within 8 sigma of its center, so the memory is
+        # O(npix) rather than O(npix * nlines)
+        flux = np.ones(npix)
+        for center, depth in zip(centers + offset, depths):
+            lo = max(int(center - 8 * sigma), 0)
+            hi = min(int(center + 8 * sigma) + 2, npix)
+            flux[lo:hi] -= depth * np.exp(-0.5 * ((pix[lo:hi] - center) / sigma) ** 2)
+        return flux
+
+    template = spectrum(0.)
+    spectra = spectrum(shift) + rng.normal(0., 0.01, (nspec, npix))
+    return spectra.astype(dtype), template.astype(dtype)
+
+
+def makestamps(nstamps, size=11, seed=0):
+    """
+      nstamps size x size stamps of 2D Gaussians with random widths,
+      centers and heights, plus noise, for the Gaussian fitters.
+    """
+    rng = np.random.default_rng(seed)
+    width = rng.uniform(1., 2.5, (nstamps, 2))
+    center = rng.uniform(size / 2. - 1., size / 2. + 1., (nstamps, 2))
+    height = rng.uniform(100., 1000., nstamps)
+    y, x = np.indices((size, size))
+    ponent = ((y - center[:, 0, np.newaxis, np.newaxis]) / width[:, 0, np.newaxis, np.newaxis]) ** 2 \
+        + ((x - center[:, 1, np.newaxis, np.newaxis]) / width[:, 1, np.newaxis, np.newaxis]) ** 2
+    stamps = height[:, np.newaxis, np.newaxis] * np.exp(-0.5 * ponent)
+    return stamps + rng.normal(0., 5., stamps.shape)
+
+
+def _single(spectra):
+    # (spectra, template) -> (first spectrum, template)
+    return spectra[0][0], spectra[1]
+
+
+def _sine(nnew, nold, nspec=None):
+    # (x_new, x_old, y_old) for splinterp(); y_old has nspec rows if given
+    x_old = np.linspace(0, 10, nold)
+    y_old = np.sin(x_old)
+    if nspec is not None:
+        y_old = y_old * np.arange(1, nspec + 1)[:, np.newaxis]
+    return np.linspace(0, 10, nnew), x_old, y_old
+
+
+def measure(func, *args, repeat=3, **kwargs):
+    """
+      Time func(*args, **kwargs) and measure its peak memory.
+
+      Parameters
+      ----------
+      func: callable
+          The function to benchmark.
+      args, kwargs:
+          Its arguments.
+      repeat: int
+          Number of timed calls; the fastest is reported.  Default: 3.
+
+      Returns
+      -------
+      seconds: float
+          Fastest wall-clock time of one call.
+      peakmem: int
+          Peak memory allocated during one call, in bytes (as traced by
+          tracemalloc, which numpy reports its arrays to).
+
+      Revisions
+      ---------
+      2026-10-17 0.1 Initial version.
+    """
+    seconds = min(timeit.repeat(lambda: func(*args, **kwargs),
+                                timer=time.perf_counter, number=1, repeat=repeat))
+
+    # traced separately: tracing slows the call down
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        peakmem = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return seconds, peakmem
+
+
+# name: {size: setup() returning (func, args, kwargs)}; every size of
+# a benchmark runs the same function on the same dtype, so the sizes
+# show how it scales, and single/batch or float64/float32 variants are
+# benchmarks of their own
+suite = {
+    'normmedcomb': {
+        'small': lambda: (mc.normmedcomb, (makestack(9, 256, 256),), {}),
+        'medium': lambda: (mc.normmedcomb, (makestack(25, 1024, 1024),), {}),
+        'large': lambda: (mc.normmedcomb, (makestack(16, 2048, 2048),), {}),
+    },
+    'normmedcomb_float32': {
+        'small': lambda: (mc.normmedcomb, (makestack(9, 256, 256, dtype=np.float32),),
+                          {'dtype': np.float32}),
+        'medium': lambda: (mc.normmedcomb, (makestack(25, 1024, 1024, dtype=np.float32),),
+                           {'dtype': np.float32}),
+        'large': lambda: (mc.normmedcomb, (makestack(16, 2048, 2048, dtype=np.float32),),
+                          {'dtype': np.float32}),
+    },
+    'cross_corr': {
+        'small': lambda: (aps.cross_corr, _single(makespectra(1, 1000)), {}),
+        'medium': lambda: (aps.cross_corr, _single(makespectra(1, 10000)), {}),
+        'large': lambda: (aps.cross_corr, _single(makespectra(1, 100000)), {}),
+    },
+    'cross_corr_batch': {
+        'small': lambda: (aps.cross_corr_batch, makespectra(10, 1000), {}),
+        'medium': lambda: (aps.cross_corr_batch, makespectra(100, 10000), {}),
+        'large': lambda: (aps.cross_corr_batch, makespectra(1000, 10000), {}),
+    },
+    'spectra_wavelength_shift': {
+        'small': lambda: (aps.spectra_wavelength_shift, makespectra(10, 1000) + (0.5,), {}),
+        'medium': lambda: (aps.spectra_wavelength_shift, makespectra(100, 10000) + (0.5,), {}),
+        'large': lambda: (aps.spectra_wavelength_shift, makespectra(1000, 10000) + (0.5,), {}),
+    },
+    'gaussianguess': {
+        'small': lambda: (g.gaussianguess, (makestamps(1, 11)[0],), {}),
+        'medium': lambda: (g.gaussianguess, (makestamps(1, 21)[0],), {}),
+        'large': lambda: (g.gaussianguess, (makestamps(1, 41)[0],), {}),
+    },
+    'gaussianguess_batch': {
+        'small': lambda: (g.gaussianguess_batch, (makestamps(100),), {}),
+        'medium': lambda: (g.gaussianguess_batch, (makestamps(1000),), {}),
+        'large': lambda: (g.gaussianguess_batch, (makestamps(10000, 21),), {}),
+    },
+    'fitgaussian': {
+        'small': lambda: (g.fitgaussian, (makestamps(1, 11)[0],), {}),
+        'medium': lambda: (g.fitgaussian, (makestamps(1, 21)[0],), {}),
+        'large': lambda: (g.fitgaussian, (makestamps(1, 41)[0],), {}),
+    },
+    'fitgaussian_batch': {
+        'small': lambda: (g.fitgaussian_batch, (makestamps(10),), {}),
+        'medium': lambda: (g.fitgaussian_batch, (makestamps(100),), {}),
+        'large': lambda: (g.fitgaussian_batch, (makestamps(1000, 21),), {}),
+    },
+    'splinterp': {
+        'small': lambda: (aps.splinterp, _sine(1000, 100), {}),
+        'medium': lambda: (aps.splinterp, _sine(100000, 10000), {}),
+        'large': lambda: (aps.splinterp, _sine(1000000, 100000), {}),
+    },
+    'splinterp_batch': {
+        'small': lambda: (aps.splinterp, _sine(4000, 1000, 10), {}),
+        'medium': lambda: (aps.splinterp, _sine(4000, 1000, 100), {}),
+        'large': lambda: (aps.splinterp, _sine(4000, 1000, 500), {}),
+    },
+}
+
+
+def runsuite(names=None, sizes=('small', 'medium', 'large'), repeat=3):
+    """
+      Run the benchmarks in suite.
+
+      Parameters
+      ----------
+      names: list of str
+          (optional) Which benchmarks to run.  Default: all of them.
+      sizes: list of str
+          Which sizes to run.  Default: small, medium and large.
+      repeat: int
+          See measure().  Default: 3.
+
+      Returns
+      -------
+      results: list of dict
+          One per benchmark and size, with keys name, size, seconds
+          and peakmem (bytes).
+
+      Examples
+      --------
+      >>> from astronomy_work import benchmarks as bm
+      >>> for r in bm.runsuite(['cross_corr'], ['small']):
+      ...     print(r['name'], r['size'], r['seconds'], r['peakmem'])
+
+      Revisions
+      ---------
+      2026-10-17 0.1 Initial version.
+      2026-10-17 0.2 One function and dtype per benchmark at every size.
+    """
+    if names is None:
+        names = list(suite)
+
+    results = []
+    for name in names:
+        for size in sizes:
+            func, args, kwargs = suite[name][size]()
+            seconds, peakmem = measure(func, *args, repeat=repeat, **kwargs)
+            results.append({'name': name, 'size': size,
+                            'seconds': seconds, 'peakmem': peakmem})
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the astronomy routines.")
+    parser.add_argument('names', nargs='*', help="benchmarks to run (default: all)")
+    parser.add_argument('--size', nargs='+', default=['small', 'medium', 'large'],
+                        choices=['small', 'medium', 'large'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help="also save the results to this file")
+    args = parser.parse_args()
+
+    results = runsuite(args.names or None, args.size, args.repeat)
+    print("%-26s %-7s %12s %12s" % ("benchmark", "size", "seconds", "peak MB"))
+    for r in results:
+        print("%-26s %-7s %12.5f %12.1f" % (r['name'], r['size'], r['seconds'],
+                                            r['peakmem'] / 2. ** 20))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
@@ -18,15 +18,27 @@
     gaussian(x, width=1., center=0., height=None, params=None)
         Evaluate the Gaussian function with given parameters at x
         (n-dimensional).
+    gaussianjac(x, width=1., center=0., height=None, params=None)
+        Evaluate the derivatives of the Gaussian function with respect
+        to its parameters at x (n-dimensional).
     fitgaussian(y, x)
         Calculates a Gaussian fit to (y, x) data, returns (width,
         center, height).
+    fitgaussian_batch(stamps)
+        Fits Gaussians to a stack of same-shaped stamps, returns a
+        structured array of (width, center, height, err, converged).
+    fitmultigaussian(y, guess, x=None)
+        Fits K Gaussians to (y, x) data simultaneously, returns
+        (width, center, height, err) with one row per component.
 
     1-dimensional functions:
 
     gaussianguess(y, x=None)
         Crudely estimates the parameters of a Gaussian that fits the
         (y, x) data.
+    gaussianguess_batch(stamps, x=None)
+        gaussianguess() for each of a stack of same-shaped stamps, as
+        arrays.
 
     Examples:
     ---------
@@ -57,13 +69,24 @@
                     in None comparisons.
     2017-10-10 0.12 jh@physics.ucf.edu Integer division of pdim to use as
                     index in Python3.
+    2026-10-17 0.13 Added separable evaluation on regular grids, analytic
+                    Jacobian (gaussianjac) for fitgaussian.
+    2026-10-17 0.14 Added fitgaussian_batch.
+    2026-10-17 0.15 Added gaussianguess_batch, used by fitgaussian_batch.
+    2026-10-17 0.16 Added fitmultigaussian.
 '''
 
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import scipy.optimize as so
+import scipy.sparse as ss
+import scipy.sparse.linalg as sla
 
 
-def gaussian(x, width=1., center=0., height=None, param=None):
+def gaussian(x, width=1., center=0., height=None, param=None,
+             separable=False, dtype=None):
     '''
       Evaluates the Gaussian with given parameters at locations in x.
 
@@ -104,6 +127,18 @@ def gaussian(x, width=1., center=0., height=None, param=None):
           width, center, and height are ignored and may be overwritten.
           This is useful in fitting functions.
 
+      separable : Boolean
+          If true, x must be a regular grid (x[i] varies only along
+          axis i, as in the output of np.indices(), which is not
+          checked).  The Gaussian is then evaluated as an outer
+          product of 1D Gaussians, which is much faster in 2 or more
+          dimensions.  Default: False.
+
+      dtype : dtype
+          Precision of the computation and the result, e.g.
+          np.float32 to halve memory use.  Default: as numpy promotes
+          the inputs (float64).
+
       Returns
       -------
       results : ndarray, same shape as x (or first element of x if
@@ -119,7 +154,7 @@ def gaussian(x, width=1., center=0., height=None, param=None):
       --------
 
       >>> import matplotlib.pyplot as plt
-      >>> import gaussian as g
+      >>> from astronomy_work import gaussian as g
 
       >>> x = np.linspace(-10., 10., 2001)
       >>> plt.plot(x, g.gaussian(x))
@@ -150,6 +185,17 @@ def gaussian(x, width=1., center=0., height=None, param=None):
       >>> plt.xlabel('X')
       >>> plt.ylabel('Y')
 
+      >>> # same result, evaluated as an outer product
+      >>> print(np.allclose(g.gaussian(a, [3,5], [7,3]),
+      ...                   g.gaussian(a, [3,5], [7,3], separable=True)))
+      True
+
+      >>> # single precision agrees with double to float32 rounding
+      >>> g32 = g.gaussian(a, [3,5], [7,3], 10., dtype=np.float32)
+      >>> print(g32.dtype, np.allclose(g32, g.gaussian(a, [3,5], [7,3], 10.),
+      ...                              rtol=1e-5, atol=1e-6))
+      float32 True
+
       Revisions
       ---------
       2007-09-17 0.1  jh@physics.ucf.edu	Initial version 0.01
@@ -162,6 +208,8 @@ def gaussian(x, width=1., center=0., height=None, param=None):
       2009-11-14 0.6  jh@physics.ucf.edu	Fixed doc for x, change example.
       2014-10-07 0.7  jh@physics.ucf.edu  Convert to Python 3.
       2016-10-25 0.11 Changed == to "is" and != to "is not" in None comparisons.
+      2026-10-17 0.12 Added separable.  np.product is np.prod in numpy 2.
+      2026-10-17 0.13 Added dtype.
    '''
     if param is not None:  # unpack parameters, if necessary
         pdim = len(param)
@@ -184,15 +232,110 @@ def gaussian(x, width=1., center=0., height=None, param=None):
         width += np.zeros(ndim)
     r2pi = np.sqrt(2. * np.pi)
     if height is None:
-        height = np.product(1. / (width * r2pi))
+        height = np.prod(1. / (width * r2pi))
+    if dtype is not None:
+        center = np.asarray(center, dtype=dtype)
+        width = np.asarray(width, dtype=dtype)
+        height = np.dtype(dtype).type(height)
+    if separable:
+        # exp(a + b) = exp(a) * exp(b): 1D exponentials, broadcast together
+        result = height
+        for i in np.arange(ndim):
+            result = result * np.exp(-0.5 * _axisdist(x, i, center, width, dtype) ** 2)
+        if 'oldshape' in locals():
+            x.shape = oldshape
+        return result
     ponent = 0.
     for i in np.arange(ndim):
-        ponent += ((x[i] - center[i]) / width[i]) ** 2
+        ponent += (np.subtract(x[i], center[i], dtype=dtype) / width[i]) ** 2
     if 'oldshape' in locals():
         x.shape = oldshape
     return height * np.exp(-0.5 * ponent)
 
 
+def _axisdist(x, i, center, width, dtype=None):
+    '''
+      (x[i] - center[i]) / width[i] for a regular grid x, computed along
+      axis i only (in precision dtype) and shaped to broadcast against
+      the full grid.
+    '''
+    ndim = x.ndim - 1
+    line = [0] * ndim
+    line[i] = slice(None)
+    shape = [1] * ndim
+    shape[i] = x.shape[i + 1]
+    return (np.subtract(x[(i,) + tuple(line)], center[i], dtype=dtype)
+            / width[i]).reshape(shape)
+
+
+def gaussianjac(x, width=1., center=0., height=None, param=None,
+                separable=False, dtype=None):
+    '''
+      Evaluates the derivatives of the Gaussian with respect to its
+      parameters at locations in x.
+
+      Parameters
+      ----------
+      x, width, center, height, param, separable, dtype :
+          As for gaussian().
+
+      Returns
+      -------
+      jac : ndarray, shape (2 * ndim + 1,) + shape of gaussian() output
+          The derivatives with respect to each width, each center, and
+          the height, in the order of param.  If height is not given
+          (the Gaussian integrates to 1), there is no height derivative
+          and the width derivatives include the change of the height.
+
+      Notes
+      -----
+      With u = (x - center) / width and f = gaussian(x, ...):
+      df/dwidth = f * u**2 / width, df/dcenter = f * u / width,
+      df/dheight = f / height.
+
+      Examples
+      --------
+      >>> from astronomy_work import gaussian as g
+      >>> x = np.indices([50, 60])
+      >>> jac = g.gaussianjac(x, param=[3., 4., 20., 25., 2.])
+      >>> jac.shape
+      (5, 50, 60)
+
+      Revisions
+      ---------
+      2026-10-17 0.1 Initial version.
+    '''
+    if param is not None:  # unpack parameters, if necessary
+        pdim = len(param)
+        if pdim // 2 == pdim / 2.:
+            pdim = pdim // 2
+        else:
+            pdim = (pdim - 1) // 2
+            height = param[-1]
+        width = param[:     pdim]
+        center = param[pdim: 2 * pdim]
+
+    if x.ndim == 1:  # 1D case may have shape (n1,) or (1, n1)
+        x = x.reshape((1, x.shape[0]))
+    ndim = x.ndim - 1
+    width = np.asarray(width, dtype=dtype or float) + np.zeros(ndim, dtype=dtype)
+    center = np.asarray(center, dtype=dtype or float) + np.zeros(ndim, dtype=dtype)
+
+    normed = height is None
+    f = gaussian(x, width, center, height, separable=separable, dtype=dtype)
+    jac = np.empty((2 * ndim + (not normed),) + f.shape, dtype=f.dtype)
+    for i in np.arange(ndim):
+        if separable:
+            u = _axisdist(x, i, center, width, dtype)
+        else:
+            u = np.subtract(x[i], center[i], dtype=dtype) / width[i]
+        jac[i] = f * (u ** 2 - normed) / width[i]
+        jac[ndim + i] = f * u / width[i]
+    if not normed:
+        jac[-1] = f / height
+    return jac
+
+
 def gaussianguess(y, x=None):
     '''
       Crudely estimates the parameters of a Gaussian that fits the (y, x) data.
@@ -231,7 +374,7 @@ def gaussianguess(y, x=None):
 
       Examples
       --------
-      >>> import gaussian as g
+      >>> from astronomy_work import gaussian as g
 
       >>> # 1D example
       >>> x = np.linspace(-10., 10., 201)
@@ -320,7 +463,97 @@ def gaussianguess(y, x=None):
     return (tuple(width), tuple(center), height)
 
 
-def fitgaussian(y, x=None, guess=None, lsargs={"maxfev": 2000}, minout=None):
+def gaussianguess_batch(stamps, x=None):
+    '''
+      Crudely estimates the parameters of Gaussians that fit each of a
+      stack of same-shaped stamps, with array operations only.
+
+      Parameters
+      ----------
+      stamps : ndarray
+          The function values, stacked along the first axis: stamps[k]
+          is the k-th N-dimensional stamp.
+      x : ndarray, same shape as np.indices(stamps[0])
+          (optional) The abcissas of every stamp, see gaussianguess().
+          Default: np.indices(stamps[0].shape)
+
+      Returns
+      -------
+      width : ndarray, shape (nstamps, N)
+      center : ndarray, shape (nstamps, N)
+      height : ndarray, shape (nstamps,)
+          The estimates gaussianguess() gives for each stamp.
+          np.hstack((width, center, height[:, None])) gives one param
+          vector (see gaussian()) per row.
+
+      Notes
+      -----
+      Method as in gaussianguess(), including the widths of 1 where
+      only one pixel is above 0.6 of the peak.  Where no pixel along
+      a line is (e.g., a stamp of zeros), the width is also 1 instead
+      of an error.
+
+      Examples
+      --------
+      >>> from astronomy_work import gaussian as g
+      >>> x = np.indices([100, 100]) - 50
+      >>> stamps = np.array([g.gaussian(x, (3,5), (13,14)),
+      ...                    g.gaussian(x, (4,2), (-5,7))])
+      >>> print(g.gaussianguess_batch(stamps, x))
+      (array([[3., 5.],
+             [4., 2.]]), array([[13., 14.],
+             [-5.,  7.]]), array([0.01061033, 0.01989437]))
+
+      Revisions
+      ---------
+      2026-10-17 0.1 Initial version, from gaussianguess().
+    '''
+    stamps = np.asarray(stamps)
+    nstamps = stamps.shape[0]
+    shape = stamps.shape[1:]
+    ndim = len(shape)
+    if x is None:
+        x = _grid(shape)
+    elif x.ndim == 1:  # 1D case may have shape (n1,) or (1, n1)
+        x = x.reshape((1, x.shape[0]))
+    if x.shape != (ndim,) + shape:
+        raise ValueError("x must have compatible shape with the stamps (and be sorted).")
+
+    # the most extreme element of each stamp
+    flat = stamps.reshape((nstamps, -1))
+    iymax = flat.argmax(axis=1)
+    iymin = flat.argmin(axis=1)
+    k = np.arange(nstamps)
+    icenter = np.where(np.abs(flat[k, iymin]) >= np.abs(flat[k, iymax]),
+                       iymin, iymax)
+    height = flat[k, icenter]
+    icenter = np.unravel_index(icenter, shape)
+
+    # 1D lines through each center along each dimension, without the
+    # last element, as in gaussianguess()
+    width = np.zeros((nstamps, ndim))
+    center = np.zeros((nstamps, ndim))
+    for i in np.arange(ndim):
+        along = np.arange(shape[i] - 1)
+        line = [ic[:, np.newaxis] for ic in icenter]
+        line[i] = along[np.newaxis, :]
+        gtsigma = stamps[(k[:, np.newaxis],) + tuple(line)] > (0.6 * height[:, np.newaxis])
+        found = gtsigma.any(axis=1)
+        imin = gtsigma.argmax(axis=1)
+        imax = along[-1] - gtsigma[:, ::-1].argmax(axis=1)
+        ixmax = list(icenter)
+        ixmin = list(icenter)
+        ixmax[i] = imax
+        ixmin[i] = imin
+        width[:, i] = (x[(i,) + tuple(ixmax)] - x[(i,) + tuple(ixmin)]) / 2.
+        width[(width[:, i] == 0) | ~found, i] = 1.  # otherwise fitgaussian will blow up
+        center[:, i] = x[(i,) + icenter]
+
+    return width, center, height
+
+
+def fitgaussian(y, x=None, guess=None, lsargs={"maxfev": 2000}, minout=None,
+                jacobian=False, separable=False):
     '''
       Fits an N-dimensional Gaussian to (value, coordinate) data.
 
@@ -345,6 +578,15 @@ def fitgaussian(y, x=None, guess=None, lsargs={"maxfev": 2000}, minout=None):
           default in the minimizer is too low.
       minout : Boolean
           If true, append the minimizer's output tuple to the other outputs.
+      jacobian : Boolean
+          If true, give the minimizer the analytic Jacobian from
+          gaussianjac() instead of letting it estimate one by finite
+          differences.  Do not set Dfun or col_deriv in lsargs.
+          Default: False.
+      separable : Boolean
+          If true, evaluate the Gaussian as an outer product, see
+          gaussian().  x must then be a regular grid, like the
+          default.  Default: False.
 
       Returns
       -------
@@ -375,7 +617,7 @@ def fitgaussian(y, x=None, guess=None, lsargs={"maxfev": 2000}, minout=None):
       --------
 
       >>> import matplotlib.pyplot as plt
-      >>> import gaussian as g
+      >>> from astronomy_work import gaussian as g
 
       >>> # parameters for X
       >>> lx = -3.  # low end of range
@@ -497,6 +739,7 @@ def fitgaussian(y, x=None, guess=None, lsargs={"maxfev": 2000}, minout=None):
       2014-11-24 0.9 jh@physics.ucf.edu    Change 2x np.append into 1x np.hstack.
       2016-10-25 0.11 Changed == to "is" and != to "is not" in None comparisons.
       2017-10-10 0.12 Integer division of pdim to use as index in Python3.
+      2026-10-17 0.13 Added jacobian and separable.
     '''
     if x is None:
         x = np.indices(y.shape)
@@ -512,8 +755,13 @@ def fitgaussian(y, x=None, guess=None, lsargs={"maxfev": 2000}, minout=None):
     gss = np.hstack((guess[0], guess[1], guess[2]))
 
     # fit
-    residuals = lambda p: np.ravel(gaussian(x, param=p) - y)
-    lsout = so.leastsq(residuals, gss, full_output=True, **lsargs)
+    residuals = lambda p: np.ravel(gaussian(x, param=p, separable=separable) - y)
+    if jacobian:
+        dfun = lambda p: gaussianjac(x, param=p, separable=separable).reshape((len(p), -1))
+        lsout = so.leastsq(residuals, gss, Dfun=dfun, col_deriv=True,
+                           full_output=True, **lsargs)
+    else:
+        lsout = so.leastsq(residuals, gss, full_output=True, **lsargs)
     p, cov, info, mesg, success = lsout
     if success < 1 \
             or success > 4:
@@ -533,3 +781,279 @@ def fitgaussian(y, x=None, guess=None, lsargs={"maxfev": 2000}, minout=None):
         ret = (width, center, height, err, lsout)
 
     return ret
+
+
+def fitgaussian_batch(stamps, guess=None, lsargs={"maxfev": 2000}, nproc=1,
+                      jacobian=True, separable=True):
+    '''
+      Fits an N-dimensional Gaussian to each of a stack of same-shaped
+      stamps.
+
+      Parameters
+      ----------
+      stamps : ndarray
+          The function values, stacked along the first axis: stamps[k]
+          is the k-th N-dimensional stamp.  The coordinates are
+          np.indices(stamps.shape[1:]), the same for every stamp.
+      guess : ndarray, shape (nstamps, 2 * N + 1)
+          (optional) Initial guesses, one param vector (see gaussian())
+          per stamp.  Default: from gaussianguess_batch().
+      lsargs : dictionary
+          Optional arguments to scipy.optimize.leastsq(), see
+          fitgaussian().
+      nproc : int
+          Number of worker processes.  Default: 1, no pool.
+      jacobian, separable : Boolean
+          See fitgaussian().  Default: True, as the coordinate grid is
+          regular.
+
+      Returns
+      -------
+      fit : structured ndarray, shape (nstamps,)
+          Fields 'width' and 'center' (N elements each), 'height',
+          'err' (2 * N + 1 elements, as in fitgaussian()), and
+          'converged' (Boolean).  A fit that did not converge does not
+          raise; its 'converged' is False and its other fields are NaN.
+
+      Notes
+      -----
+      The coordinate grid is built once per process and shape.  The
+      stamps are split into chunks, 4 per process, and fitted in order.
+
+      Examples
+      --------
+      >>> from astronomy_work import gaussian as g
+      >>> x = np.indices((15, 15))
+      >>> stamps = np.array([g.gaussian(x, 2., (7. + k / 10., 7.), 100.)
+      ...                    for k in np.arange(10)])
+      >>> fit = g.fitgaussian_batch(stamps, nproc=2)
+      >>> fit['center'][:3]
+      array([[7. , 7. ],
+             [7.1, 7. ],
+             [7.2, 7. ]])
+      >>> fit['converged'].all()
+      True
+
+      Revisions
+      ---------
+      2026-10-17 0.1 Initial version.
+    '''
+    stamps = np.asarray(stamps)
+    nstamps = stamps.shape[0]
+    if guess is None:
+        width, center, height = gaussianguess_batch(stamps)
+        guess = np.hstack((width, center, height[:, np.newaxis]))
+    else:
+        guess = np.asarray(guess, dtype=float)
+        if guess.shape[0] != nstamps:
+            raise ValueError("guess must have one row per stamp.")
+
+    args = (lsargs, jacobian, separable)
+    if nproc <= 1:
+        return _fitchunk(stamps, guess, *args)
+
+    nchunk = max(1, -(-nstamps // (4 * nproc)))
+    starts = np.arange(0, nstamps, nchunk)
+    chunks = [stamps[i: i + nchunk] for i in starts]
+    guesses = [guess[i: i + nchunk] for i in starts]
+    with ProcessPoolExecutor(nproc) as pool:
+        fits = list(pool.map(_fitchunk, chunks, guesses,
+                             *[[arg] * len(chunks) for arg in args]))
+    return np.concatenate(fits)
+
+
+def fitmultigaussian(y, guess, x=None, cutoff=5.,
+                     lsargs={"max_nfev": 2000, "x_scale": 'jac'}, minout=None):
+    '''
+      Fits K N-dimensional Gaussians to (value, coordinate) data at once,
+      for blended sources.
+
+      Parameters
+      ----------
+      y : ndarray
+          Array giving the values of the function, the sum of the
+          Gaussians.
+      guess : array_like, shape (K, 2 * N + 1)
+          Initial guess, one param vector (see gaussian()) per component.
+      x : ndarray, same shape as np.indices(y)
+          (optional) The abcissas of y, which must be a regular grid
+          sorted ascending (neither is checked).  Default: np.indices(y)
+      cutoff : float
+          Each component is evaluated only within cutoff guessed widths
+          of its guessed center, and is 0 outside.  Default: 5.
+      lsargs : dictionary
+          Optional arguments to scipy.optimize.least_squares(), such as
+          max_nfev, ftol, xtol, and gtol.  Do not redefine jac.  By
+          default, max_nfev is 2000 and the parameters are scaled by
+          the Jacobian (x_scale='jac'), as widths and heights differ
+          by orders of magnitude.
+      minout : Boolean
+          If true, append the minimizer's OptimizeResult to the other
+          outputs.
+
+      Returns
+      -------
+      width : ndarray, shape (K, N)
+          The fitted Gaussian widths of each component.
+      center : ndarray, shape (K, N)
+          The fitted Gaussian centers of each component.
+      height : ndarray, shape (K,)
+          The fitted heights.
+      err : ndarray, shape (K, 2 * N + 1)
+          The uncertainties of each component's parameters, ordered as
+          in param, computed as in fitgaussian().  NaN if the problem
+          is singular.
+      lsout : OptimizeResult
+          (Optional) Minimizer output.  Included only if minout=True.
+
+      Notes
+      -----
+      Method: Each component touches only the pixels of its box, so
+      the Jacobian is sparse, with (2 * N + 1) columns per component
+      filled only on that component's rows.  It is computed
+      analytically with gaussianjac() and handed to the trust-region
+      reflective solver of scipy.optimize.least_squares(), whose cost
+      then grows with the number of overlapping components rather
+      than with K squared.  The uncertainties come from a sparse LU
+      factorization of J^T J.
+
+      Examples
+      --------
+      >>> from astronomy_work import gaussian as g
+      >>> x = np.indices((40, 40))
+      >>> y = (g.gaussian(x, 2., (18., 17.), 100.)
+      ...      + g.gaussian(x, 2.5, (21., 22.), 60.))
+      >>> width, center, height, err = g.fitmultigaussian(
+      ...     y, [[2, 2, 18, 18, 90], [2, 2, 22, 22, 50]])
+      >>> center
+      array([[18., 17.],
+             [21., 22.]])
+
+      Revisions
+      ---------
+      2026-10-17 0.1 Initial version.
+    '''
+    y = np.asarray(y, dtype=float)
+    shape = y.shape
+    ndim = y.ndim
+    if x is None:
+        x = _grid(shape)
+    elif x.ndim == 1:  # 1D case may have shape (n1,) or (1, n1)
+        x = x.reshape((1, x.shape[0]))
+    if x.shape != (ndim,) + shape:
+        raise ValueError("x must give coordinates of points in y.")
+    guess = np.atleast_2d(np.asarray(guess, dtype=float))
+    ncomp, npar = guess.shape
+    if npar != 2 * ndim + 1:
+        raise ValueError("guess must have 2 * ndim + 1 columns.")
+
+    # the box of each component, its flat pixel indices and coordinates
+    pixels = np.arange(y.size).reshape(shape)
+    rows = []
+    subx = []
+    for k in np.arange(ncomp):
+        box = []
+        for i in np.arange(ndim):
+            line = [0] * ndim
+            line[i] = slice(None)
+            axis = x[(i,) + tuple(line)]
+            reach = cutoff * np.abs(guess[k, i])
+            lo = np.searchsorted(axis, guess[k, ndim + i] - reach)
+            hi = np.searchsorted(axis, guess[k, ndim + i] + reach, 'right')
+            box.append(slice(lo, max(hi, lo + 1)))
+        box = tuple(box)
+        rows.append(pixels[box].ravel())
+        subx.append(x[(slice(None),) + box])
+
+    # sparsity structure: component k's columns on its own rows only
+    jrows = np.concatenate([np.tile(r, npar) for r in rows])
+    jcols = np.concatenate([np.repeat(k * npar + np.arange(npar), len(rows[k]))
+                            for k in np.arange(ncomp)])
+
+    yflat = y.ravel()
+
+    def residuals(p):
+        p = p.reshape((ncomp, npar))
+        model = np.zeros(y.size)
+        for k in np.arange(ncomp):
+            model[rows[k]] += np.ravel(gaussian(subx[k], param=p[k],
+                                                separable=True))
+        return model - yflat
+
+    def jacobian(p):
+        p = p.reshape((ncomp, npar))
+        vals = np.concatenate([np.ravel(gaussianjac(subx[k], param=p[k],
+                                                    separable=True))
+                               for k in np.arange(ncomp)])
+        return ss.csr_matrix((vals, (jrows, jcols)),
+                             shape=(y.size, ncomp * npar))
+
+    lsout = so.least_squares(residuals, guess.ravel(), jac=jacobian,
+                             method='trf', tr_solver='lsmr', **lsargs)
+    if lsout.status < 1:
+        raise ValueError(lsout.message + " No convergence.  Guess = " + str(guess) \
+                         + "; try a different guess, max_nfev, or tolerances.\n See scipy.optimize.least_squares() docs.")
+    p = lsout.x.reshape((ncomp, npar))
+
+    # diagonal of (J^T J)^-1, one component's columns at a time
+    jac = jacobian(lsout.x)
+    err = np.full((ncomp, npar), np.nan)
+    try:
+        lu = sla.splu((jac.T @ jac).tocsc())
+        for k in np.arange(ncomp):
+            unit = np.zeros((ncomp * npar, npar))
+            unit[k * npar + np.arange(npar), np.arange(npar)] = 1.
+            err[k] = np.sqrt(np.diagonal(lu.solve(unit)[k * npar: (k + 1) * npar]))
+    except RuntimeError:  # exactly singular
+        pass
+
+    # unravel the result
+    width = p[:, :ndim]
+    center = p[:, ndim: 2 * ndim]
+    height = p[:, -1]
+
+    ret = (width, center, height, err)
+
+    if minout:
+        ret = (width, center, height, err, lsout)
+
+    return ret
+
+
+@functools.lru_cache(maxsize=8)
+def _grid(shape):
+    '''
+      np.indices(shape), built once per shape and read-only.
+    '''
+    x = np.indices(shape)
+    x.flags.writeable = False
+    return x
+
+
+def _fitdtype(ndim):
+    '''
+      Structured dtype of the output of fitgaussian_batch().
+    '''
+    return np.dtype([('width', float, (ndim,)), ('center', float, (ndim,)),
+                     ('height', float), ('err', float, (2 * ndim + 1,)),
+                     ('converged', bool)])
+
+
+def _fitchunk(stamps, guess, lsargs, jacobian, separable):
+    '''
+      Fit each stamp in a chunk, see fitgaussian_batch().
+    '''
+    x = _grid(stamps.shape[1:])
+    ndim = stamps.ndim - 1
+    fit = np.zeros(stamps.shape[0], dtype=_fitdtype(ndim))
+    for k in np.arange(stamps.shape[0]):
+        gss = (guess[k, :ndim], guess[k, ndim: 2 * ndim], guess[k, -1])
+        try:
+            width, center, height, err = fitgaussian(
+                stamps[k], x, gss, lsargs, jacobian=jacobian,
+                separable=separable)
+        except ValueError:
+            fit[k] = (np.nan, np.nan, np.nan, np.nan, False)
+            continue
+        fit[k] = (width, center, height, err, True)
+    return fit
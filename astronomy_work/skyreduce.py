@@ -0,0 +1,174 @@
+'''
+Streaming sky correction of a night's worth of frames:
+  fitsfiles()
+  skycorrect()
+  reducenight()
+
+Run as a script to reduce a directory:
+  python -m astronomy_work.skyreduce indir outdir [--sky '*sky*.fits']
+'''
+
+import argparse
+import glob
+import os
+
+import astropy.io.fits as fits
+import numpy as np
+
+from astronomy_work.ast_proj_scripts import FitsWriter
+from astronomy_work.medcombine import normmedcomb, skycormednorm
+
+
+def fitsfiles(directory, pattern='*.fits'):
+    """
+      Sorted list of the files in directory matching pattern.
+    """
+    return sorted(glob.glob(os.path.join(directory, pattern)))
+
+
+def skycorrect(objfiles, normsky, region=((None, None), (None, None))):
+    """
+      Sky-correct FITS frames one at a time, lazily.
+
+      Each frame is read, corrected in place with skycormednorm(), and
+      yielded before the next is read, so only one frame is in memory.
+      Integer frames are converted to floating point first.
+
+      Parameters
+      ----------
+      objfiles: iterable of str
+          Names of the object frames (primary HDU).
+      normsky: ndarray, 2D
+          Normalized sky frame, from normmedcomb().
+      region: tuple of 2 tuples of 2 ints, ((y1, x1), (y2, x2))
+          Normalization region, see skycormednorm().
+
+      Returns
+      -------
+      A generator of (filename, corrected frame, header) tuples.
+
+      Revisions
+      ---------
+      2026-10-17 0.1 Initial version.
+    """
+    for filename in objfiles:
+        with fits.open(filename, memmap=False) as hdul:
+            data = hdul[0].data
+            header = hdul[0].header
+        # the frame was just read, so it is ours to overwrite
+        if not np.issubdtype(data.dtype, np.floating):
+            data = data.astype(float)
+        yield filename, skycormednorm(data, normsky, region, inplace=True), header
+
+
+def reducenight(indir, outdir, pattern='*.fits', skypattern=None,
+                region=((None, None), (None, None)), suffix='_skycor',
+                method='median', maxmem=2 ** 28, nproc=1, compress=False,
+                overwrite=False):
+    """
+      Sky-correct every frame in a directory, streaming.
+
+      Builds the normalized sky with normmedcomb() in its out-of-core
+      mode, then sky-corrects the object frames one at a time and
+      writes them from a background thread as it goes.  Memory use is
+      a few frames, however many files there are.  Frames whose output
+      already exists and is newer than the input are skipped, so an
+      interrupted reduction can simply be run again.
+
+      Parameters
+      ----------
+      indir: str
+          Directory of input frames.
+      outdir: str
+          Directory for the corrected frames, created if needed.  Each
+          is named like its input, with suffix before the extension.
+      pattern: str
+          Glob pattern of the object frames in indir.  Default: '*.fits'.
+      skypattern: str
+          (optional) Glob pattern of the frames in indir to build the
+          sky from.  Default: the object frames themselves.
+      region: tuple of 2 tuples of 2 ints, ((y1, x1), (y2, x2))
+          Normalization region, see normmedcomb().
+      suffix: str
+          Appended to the output file names.  Default: '_skycor'.
+      method, maxmem, nproc:
+          See normmedcomb().
+      compress: Boolean or str
+          Tile-compress the output, see ast_proj_scripts.FitsWriter.
+      overwrite: Boolean
+          Redo frames whose output already exists.  Default: False.
+
+      Returns
+      -------
+      written: list of str
+          Names of the files written by this run.
+
+      Examples
+      --------
+      >>> from astronomy_work import skyreduce as sr
+      >>> sr.reducenight('raw/2026-10-16', 'red/2026-10-16',
+      ...                pattern='obj*.fits', skypattern='sky*.fits',
+      ...                region=((100, 100), (900, 900)), nproc=8)
+
+      Revisions
+      ---------
+      2026-10-17 0.1 Initial version.
+    """
+    def outname(filename):
+        base, ext = os.path.splitext(os.path.basename(filename))
+        return os.path.join(outdir, base + suffix + ext)
+
+    # outputs may share indir, never reduce them again
+    objfiles = [f for f in fitsfiles(indir, pattern)
+                if not os.path.splitext(f)[0].endswith(suffix)]
+    skyfiles = objfiles if skypattern is None else fitsfiles(indir, skypattern)
+    os.makedirs(outdir, exist_ok=True)
+
+    todo = [f for f in objfiles if overwrite or not _uptodate(f, outname(f))]
+    if not todo:
+        return []
+    if not skyfiles:
+        raise ValueError("No sky frames match " + str(skypattern) + ".")
+
+    normsky, normfact = normmedcomb(skyfiles, region, maxmem=maxmem,
+                                    method=method, nproc=nproc)
+
+    written = []
+    with FitsWriter(compress=compress) as writer:
+        for filename, data, header in skycorrect(todo, normsky, region):
+            writer.write(outname(filename), data, header)
+            written.append(outname(filename))
+
+    return written
+
+
+def _uptodate(infile, outfile):
+    """
+      Whether outfile exists and is newer than infile.
+    """
+    return os.path.exists(outfile) \
+        and os.path.getmtime(outfile) >= os.path.getmtime(infile)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sky-correct a directory of FITS frames.")
+    parser.add_argument('indir')
+    parser.add_argument('outdir')
+    parser.add_argument('--pattern', default='*.fits')
+    parser.add_argument('--sky', default=None, help="glob pattern of the sky frames")
+    parser.add_argument('--region', type=int, nargs=4, metavar=('Y1', 'X1', 'Y2', 'X2'))
+    parser.add_argument('--method', default='median')
+    parser.add_argument('--nproc', type=int, default=1)
+    parser.add_argument('--compress', action='store_true')
+    parser.add_argument('--overwrite', action='store_true')
+    args = parser.parse_args()
+
+    region = ((None, None), (None, None))
+    if args.region:
+        y1, x1, y2, x2 = args.region
+        region = ((y1, x1), (y2, x2))
+
+    written = reducenight(args.indir, args.outdir, args.pattern, args.sky, region,
+                          method=args.method, nproc=args.nproc,
+                          compress=args.compress, overwrite=args.overwrite)
+    print("Frames written:", len(written))
@@ -0,0 +1,296 @@
+'''
+Routines to find and centroid the sources in a full frame:
+  skybackground()
+  findsources()
+  cutstamps()
+  centroidframe()
+  centroidtable()
+'''
+
+import collections
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.ndimage as nd
+
+from astronomy_work.gaussian import fitgaussian_batch
+
+
+def skybackground(frame, box=64, nsigma=3., maxiter=5):
+    """
+      Estimate the sky background and its noise over a frame.
+
+      The frame is cut into box x box cells.  In each cell, values more
+      than nsigma standard deviations from the median are rejected
+      until none are (or maxiter times).  The clipped medians and
+      standard deviations of the cells are then interpolated bilinearly
+      back to every pixel.
+
+      Parameters
+      ----------
+      frame: ndarray, 2D
+          The data.
+      box: int
+          Cell size in pixels.  Should be several times larger than
+          the sources.  Default: 64.
+      nsigma: float
+          Rejection threshold in standard deviations.  Default: 3.
+      maxiter: int
+          Maximum number of rejection passes.  Default: 5.
+
+      Returns
+      -------
+      bkg: ndarray, 2D
+          The background, same shape as frame.
+      rms: ndarray, 2D
+          The background noise, same shape as frame.
+
+      Revisions
+      ---------
+      2026-10-17 0.1 Initial version.
+    """
+    ny, nx = frame.shape
+    nby = -(-ny // box)
+    nbx = -(-nx // box)
+
+    # cells along the last axis, padded with NaN at the edges
+    cells = np.full((nby * box, nbx * box), np.nan)
+    cells[:ny, :nx] = frame
+    cells = cells.reshape((nby, box, nbx, box)).swapaxes(1, 2)
+    cells = cells.reshape((nby, nbx, box * box))
+
+    for i in np.arange(maxiter):
+        med = np.nanmedian(cells, axis=2)
+        std = np.nanstd(cells, axis=2)
+        clip = np.abs(cells - med[..., np.newaxis]) > nsigma * std[..., np.newaxis]
+        if not clip.any():
+            break
+        cells[clip] = np.nan
+    med = np.nanmedian(cells, axis=2)
+    std = np.nanstd(cells, axis=2)
+
+    # bilinear interpolation between cell centers
+    yy = (np.arange(ny) + 0.5) / box - 0.5
+    xx = (np.arange(nx) + 0.5) / box - 0.5
+    coords = np.array(np.meshgrid(yy, xx, indexing='ij'))
+    bkg = nd.map_coordinates(med, coords, order=1, mode='nearest')
+    rms = nd.map_coordinates(std, coords, order=1, mode='nearest')
+
+    return bkg, rms
+
+
+def findsources(frame, nsigma=5., minsep=3, box=64, bkg=None, rms=None):
+    """
+      Find the sources in a frame by thresholding.
+
+      A source is a local maximum of the background-subtracted frame,
+      within minsep pixels, that is more than nsigma times the
+      background noise.
+
+      Parameters
+      ----------
+      frame: ndarray, 2D
+          The data.
+      nsigma: float
+          Detection threshold in units of the background noise.
+          Default: 5.
+      minsep: int
+          Minimum separation of two sources in pixels.  Default: 3.
+      box: int
+          Cell size for skybackground(), if bkg and rms are not given.
+      bkg, rms: ndarray, 2D
+          (optional) Background and its noise, from skybackground().
+
+      Returns
+      -------
+      ys, xs: ndarray, 1D, int
+          Row and column of each source's peak pixel, brightest first.
+
+      Revisions
+      ---------
+      2026-10-17 0.1 Initial version.
+    """
+    if bkg is None or rms is None:
+        bkg, rms = skybackground(frame, box)
+
+    sub = frame - bkg
+    peak = (sub == nd.maximum_filter(sub, size=2 * minsep + 1)) \
+        & (sub > nsigma * rms)
+    ys, xs = np.nonzero(peak)
+    order = np.argsort(sub[ys, xs])[::-1]
+
+    return ys[order], xs[order]
+
+
+def cutstamps(frame, ys, xs, size=11):
+    """
+      Cut size x size stamps centered on the given pixels.
+
+      The stamps come from a strided window view of the frame, so
+      nothing is copied until they are gathered into one array.
+      Sources closer than size // 2 to the edge get no stamp.
+
+      Parameters
+      ----------
+      frame: ndarray, 2D
+          The data.
+      ys, xs: array_like, 1D, int
+          Row and column of each stamp center.
+      size: int
+          Stamp size (odd).  Default: 11.
+
+      Returns
+      -------
+      stamps: ndarray, 3D
+          One stamp per kept source.  Stamp pixel [i, j] is frame
+          pixel [y - size // 2 + i, x - size // 2 + j].
+      keep: ndarray, 1D, bool
+          Which of ys, xs got a stamp.
+
+      Revisions
+      ---------
+      2026-10-17 0.1 Initial version.
+    """
+    ys = np.asarray(ys)
+    xs = np.asarray(xs)
+    half = size // 2
+    ny, nx = frame.shape
+    keep = (ys >= half) & (ys < ny - half) & (xs >= half) & (xs < nx - half)
+
+    windows = np.lib.stride_tricks.sliding_window_view(frame, (size, size))
+    stamps = windows[ys[keep] - half, xs[keep] - half]
+
+    return stamps, keep
+
+
+def centroidframe(frame, nsigma=5., size=11, minsep=3, box=64, tile=1024,
+                  nproc=1, lsargs={"maxfev": 2000}):
+    """
+      Find and centroid every source in a frame, tile by tile.
+
+      The background and its noise are estimated once over the whole
+      frame, so the results do not depend on tile.  The frame is then
+      processed in tile x tile pieces, each padded by an overlap so
+      that stamps and peak searches near the tile edges are complete.
+      In each tile sources are detected, stamps are cut and
+      background-subtracted, and Gaussians are fitted to them with
+      fitgaussian_batch().  Each source is reported only by the tile
+      whose unpadded area holds its peak.
+
+      Parameters
+      ----------
+      frame: ndarray, 2D
+          The data.
+      nsigma, minsep, box:
+          See findsources() and skybackground().
+      size: int
+          Stamp size (odd).  Default: 11.
+      tile: int
+          Tile size in pixels, before padding.  Default: 1024.
+      nproc: int
+          Number of worker processes.  Default: 1, no pool.
+      lsargs: dictionary
+          Optional arguments to scipy.optimize.leastsq().
+
+      Returns
+      -------
+      A generator of structured ndarrays, one per tile in row order,
+      with fields:
+      y, x: fitted center in frame pixel coordinates
+      width: fitted widths (y, x)
+      height: fitted height above the background
+      err: uncertainties of width, center and height, as in fitgaussian()
+      converged: whether the fit converged (if not, the fitted fields
+          are NaN)
+      ypeak, xpeak: peak pixel
+      background: background at the peak pixel
+
+      Examples
+      --------
+      >>> from astronomy_work import sourcefind as sf
+      >>> for table in sf.centroidframe(frame, nproc=8):
+      ...     np.savetxt(out, table[['y', 'x', 'height']].tolist())
+
+      Revisions
+      ---------
+      2026-10-17 0.1 Initial version.
+      2026-10-17 0.2 Background from the whole frame rather than per
+                     tile, whose cells did not line up.
+    """
+    ny, nx = frame.shape
+    pad = size // 2 + minsep
+    args = (nsigma, size, minsep, lsargs)
+    bkg, rms = skybackground(frame, box)
+
+    def pieces():
+        for y0 in range(0, ny, tile):
+            for x0 in range(0, nx, tile):
+                py0, px0 = max(y0 - pad, 0), max(x0 - pad, 0)
+                py1, px1 = min(y0 + tile + pad, ny), min(x0 + tile + pad, nx)
+                core = (y0 - py0, x0 - px0,
+                        min(y0 + tile, ny) - py0, min(x0 + tile, nx) - px0)
+                yield (frame[py0:py1, px0:px1], bkg[py0:py1, px0:px1],
+                       rms[py0:py1, px0:px1], (py0, px0), core)
+
+    if nproc <= 1:
+        for data, tbkg, trms, origin, core in pieces():
+            yield _centroidtile(data, tbkg, trms, origin, core, *args)
+        return
+
+    # tiles are sent to the workers, at most 2 per process at a time
+    pending = collections.deque()
+    with ProcessPoolExecutor(nproc) as pool:
+        for data, tbkg, trms, origin, core in pieces():
+            pending.append(pool.submit(_centroidtile, np.array(data), np.array(tbkg),
+                                       np.array(trms), origin, core, *args))
+            if len(pending) >= 2 * nproc:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def centroidtable(frame, **kwargs):
+    """
+      All of centroidframe()'s results as one structured ndarray.
+      Takes the same keywords.
+    """
+    return np.concatenate(list(centroidframe(frame, **kwargs)))
+
+
+_tabledtype = np.dtype([('y', float), ('x', float), ('width', float, (2,)),
+                        ('height', float), ('err', float, (5,)),
+                        ('converged', bool), ('ypeak', int), ('xpeak', int),
+                        ('background', float)])
+
+
+def _centroidtile(data, bkg, rms, origin, core, nsigma, size, minsep, lsargs):
+    """
+      Find and centroid the sources of one padded tile whose peaks lie
+      in core = (y0, x0, y1, x1), in tile coordinates; bkg and rms are
+      the frame's background and noise over the tile.
+    """
+    ys, xs = findsources(data, nsigma, minsep, bkg=bkg, rms=rms)
+    y0, x0, y1, x1 = core
+    incore = (ys >= y0) & (ys < y1) & (xs >= x0) & (xs < x1)
+    ys, xs = ys[incore], xs[incore]
+
+    stamps, keep = cutstamps(data, ys, xs, size)
+    ys, xs = ys[keep], xs[keep]
+    table = np.zeros(len(ys), dtype=_tabledtype)
+    if len(ys) == 0:
+        return table
+
+    half = size // 2
+    fit = fitgaussian_batch(stamps - bkg[ys, xs][:, np.newaxis, np.newaxis],
+                            lsargs=lsargs)
+    table['y'] = fit['center'][:, 0] + ys - half + origin[0]
+    table['x'] = fit['center'][:, 1] + xs - half + origin[1]
+    table['width'] = fit['width']
+    table['height'] = fit['height']
+    table['err'] = fit['err']
+    table['converged'] = fit['converged']
+    table['ypeak'] = ys + origin[0]
+    table['xpeak'] = xs + origin[1]
+    table['background'] = bkg[ys, xs]
+
+    return table
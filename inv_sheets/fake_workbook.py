@@ -0,0 +1,106 @@
+import collections
+import copy
+
+import gspread
+from gspread.utils import fill_gaps
+
+
+# An offline stand-in for a gspread Spreadsheet, holding each sheet's
+# values in memory and counting the API requests the real one would make:
+#
+#   workbook = FakeWorkbook({'AB': [['SKU', 'QTY'], ['AB0001', '2']]})
+#   get_all_sheets_records(workbook)
+#   workbook.requests  ->  Counter({'fetch_sheet_metadata': 1, 'values_batch_get': 1})
+
+class FakeWorkbook:
+
+    def __init__(self, sheets, id='fake-workbook'):
+        self.id = id
+        self.sheets = {title: copy.deepcopy(values) for title, values in sheets.items()}
+        self.requests = collections.Counter()
+        self.version = 0
+
+    @property
+    def request_count(self):
+        return sum(self.requests.values())
+
+    def get_lastUpdateTime(self):
+        self.requests['drive_metadata'] += 1
+        return '2026-01-01T00:00:00.%03dZ' % self.version
+
+    def touch(self):
+        # as if someone edited the workbook
+        self.version += 1
+
+    def worksheets(self):
+        self.requests['fetch_sheet_metadata'] += 1
+        return [FakeWorksheet(self, title) for title in self.sheets]
+
+    def worksheet(self, title):
+        self.requests['fetch_sheet_metadata'] += 1
+        if title not in self.sheets:
+            raise gspread.WorksheetNotFound(title)
+        return FakeWorksheet(self, title)
+
+    def values_batch_get(self, ranges, params=None):
+        self.requests['values_batch_get'] += 1
+        value_ranges = []
+        for name in ranges:
+            value_range = {'range': name}
+            values = trimmed(self.sheets[sheet_title(name)])
+            if values:
+                value_range['values'] = values
+            value_ranges.append(value_range)
+        return {'valueRanges': value_ranges}
+
+
+class FakeWorksheet:
+
+    def __init__(self, workbook, title):
+        self.workbook = workbook
+        self.title = title
+
+    def get(self, range_name=None, **kwargs):
+        self.workbook.requests['values_get'] += 1
+        return fill_gaps(trimmed(self.workbook.sheets[self.title]) or [[]])
+
+    def get_all_values(self, **kwargs):
+        return self.get()
+
+    def get_all_records(self, **kwargs):
+        # gspread's own record building, on top of get()
+        return gspread.Worksheet.get_all_records(self, **kwargs)
+
+    def find(self, query):
+        self.workbook.requests['values_get'] += 1
+        for r, row in enumerate(self.workbook.sheets[self.title]):
+            for c, value in enumerate(row):
+                if value == query:
+                    return gspread.Cell(r + 1, c + 1, value)
+        return None
+
+    def update_cell(self, row, col, value):
+        self.workbook.requests['values_update'] += 1
+        self.workbook.touch()
+        values = self.workbook.sheets[self.title]
+        values[:] = fill_gaps(values, max(row, len(values)), max(col, max(map(len, values), default=0)))
+        values[row - 1][col - 1] = value
+
+
+def sheet_title(range_name):
+    # "'O''B'!A1:C3" -> "O'B"
+    title = range_name.rsplit('!', 1)[0] if not range_name.endswith("'") else range_name
+    if title.startswith("'"):
+        title = title[1:-1].replace("''", "'")
+    return title
+
+
+def trimmed(values):
+    # as the API returns them: trailing empty cells and rows dropped
+    rows = [list(row) for row in values]
+    for row in rows:
+        while row and row[-1] == '':
+            row.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
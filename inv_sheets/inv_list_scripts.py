@@ -1,7 +1,11 @@
 import gspread, re
+from gspread.utils import absolute_range_name, fill_gaps, numericise_all
 from oauth2client.service_account import ServiceAccountCredentials
 import time
 
+# worksheets per values:batchGet request
+BATCH_SHEETS = 40
+
 def authorize_sheets(url, creds):
     scope = ['https://spreadsheets.google.com/feeds',
              'https://www.googleapis.com/auth/drive']
@@ -50,11 +54,74 @@ def get_sheet_records(workbook, sheet):
     return sheet_data
 
 
-def get_all_sheets_records(workbook):
+def batch_get_values(workbook, sheet_list, chunk=BATCH_SHEETS):
+    # every sheet's values in one values:batchGet request per chunk of
+    # sheets, rows padded to the sheet's width as get_all_values() does
+    all_values = []
+
+    for i in range(0, len(sheet_list), chunk):
+        print("Downloading:", ", ".join(sheet_list[i:i + chunk]))
+        ranges = [absolute_range_name(sheet) for sheet in sheet_list[i:i + chunk]]
+        response = workbook.values_batch_get(ranges)
+        for value_range in response.get('valueRanges', []):
+            all_values.append(fill_gaps(value_range.get('values', [[]])))
+
+    return all_values
+
+
+def values_to_records(values):
+    # what get_all_records() makes of a sheet's values
+    if values == [[]]:
+        return []
+    headers = values[0]
+
+    return [dict(zip(headers, numericise_all(row))) for row in values[1:]]
+
+
+def workbook_modified(workbook):
+    # Drive's modifiedTime of the whole workbook; the Sheets API keeps no
+    # revision per worksheet
+    if hasattr(workbook, 'get_lastUpdateTime'):
+        return workbook.get_lastUpdateTime()
+    return workbook.lastUpdateTime
+
+
+def get_cached_values(workbook, cache, offline=False):
+    # sheet titles and values from cache, fetched again (in one batch)
+    # only if the workbook was modified since; offline never asks the API
+    if offline:
+        if cache.modified() is None:
+            raise LookupError("No cached copy of workbook " + cache.workbook_id)
+        print("Using cached inventory from", cache.modified())
+        return cache.load()
+
+    modified = workbook_modified(workbook)
+    if cache.modified() == modified:
+        print("Inventory unchanged since", modified)
+        return cache.load()
+
     sheet_list = get_sheet_list(workbook)
+    all_values = batch_get_values(workbook, sheet_list)
+    cache.store(modified, sheet_list, all_values)
 
+    return sheet_list, all_values
+
+
+def get_all_sheets_records(workbook, batched=True, cache=None, offline=False):
     all_sheet_data = []
 
+    if cache is not None:
+        for values in get_cached_values(workbook, cache, offline)[1]:
+            all_sheet_data.append(values_to_records(values))
+        return all_sheet_data
+
+    sheet_list = get_sheet_list(workbook)
+
+    if batched:
+        for values in batch_get_values(workbook, sheet_list):
+            all_sheet_data.append(values_to_records(values))
+        return all_sheet_data
+
     for sheet in sheet_list:
         print("Downloading:", sheet)
         sheet_data = get_sheet_records(workbook, sheet)
@@ -64,12 +131,24 @@ def get_all_sheets_records(workbook):
     return all_sheet_data
 
 
-def get_all_sheets(workbook):
-    sheet_list = get_sheet_list(workbook)
-
+def get_all_sheets(workbook, batched=True, cache=None, offline=False):
     all_sheet_data = []
     all_sheet_headers = []
 
+    if cache is not None:
+        for values in get_cached_values(workbook, cache, offline)[1]:
+            all_sheet_headers.append(values.pop(0))
+            all_sheet_data.append(values)
+        return all_sheet_headers, all_sheet_data
+
+    sheet_list = get_sheet_list(workbook)
+
+    if batched:
+        for values in batch_get_values(workbook, sheet_list):
+            all_sheet_headers.append(values.pop(0))
+            all_sheet_data.append(values)
+        return all_sheet_headers, all_sheet_data
+
     for sheet in sheet_list:
         headers, sheet_data = get_sheet(workbook, sheet)
         all_sheet_headers.append(headers)
@@ -0,0 +1,54 @@
+import json
+import os
+import sqlite3
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'inventory_sheets.sqlite')
+
+
+class SheetCache:
+    # the values of a workbook's worksheets, one row per worksheet, with
+    # the workbook's modified time they were fetched at
+
+    def __init__(self, workbook_id, path=DEFAULT_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.workbook_id = workbook_id
+        self.db = sqlite3.connect(path)
+        self.db.execute('''CREATE TABLE IF NOT EXISTS sheets (
+                           workbook TEXT, position INTEGER, title TEXT,
+                           modified TEXT, vals TEXT,
+                           PRIMARY KEY (workbook, title))''')
+        self.db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def modified(self):
+        # modified time of the cached copy, or None if there is none
+        row = self.db.execute('SELECT MIN(modified) FROM sheets WHERE workbook = ?',
+                              (self.workbook_id,)).fetchone()
+        return row[0]
+
+    def load(self):
+        # sheet titles and their values, in workbook order
+        rows = self.db.execute('SELECT title, vals FROM sheets WHERE workbook = ? ORDER BY position',
+                               (self.workbook_id,)).fetchall()
+        return [title for title, vals in rows], [json.loads(vals) for title, vals in rows]
+
+    def store(self, modified, sheet_list, all_values):
+        # replaces the cached copy; sheets no longer in the workbook go
+        with self.db:
+            self.db.execute('DELETE FROM sheets WHERE workbook = ?', (self.workbook_id,))
+            self.db.executemany('INSERT INTO sheets VALUES (?, ?, ?, ?, ?)',
+                                [(self.workbook_id, i, title, modified, json.dumps(values))
+                                 for i, (title, values) in enumerate(zip(sheet_list, all_values))])
+
+    def invalidate(self):
+        with self.db:
+            self.db.execute('DELETE FROM sheets WHERE workbook = ?', (self.workbook_id,))
@@ -1,14 +1,20 @@
 import csv
 from datetime import datetime
 
+from gspread.utils import extract_id_from_url
+
 from inv_sheets.inv_list_scripts import authorize_sheets, get_all_sheets_records
+from inv_sheets.sheet_cache import SheetCache
 
 
-def download_inventory(url, creds):
-    workbook = authorize_sheets(url, creds)
+def download_inventory(url, creds, cache=True, offline=False):
+    # cache: keep the sheets on disk and download them again only when
+    # the workbook has changed; offline: use the cached copy only
+    sheet_cache = SheetCache(extract_id_from_url(url)) if cache or offline else None
+    workbook = None if offline else authorize_sheets(url, creds)
 
     print("\nDownloading inventory sheets...")
-    sheet_data = get_all_sheets_records(workbook)
+    sheet_data = get_all_sheets_records(workbook, cache=sheet_cache, offline=offline)
 
     master_sheet = []
 
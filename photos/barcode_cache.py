@@ -0,0 +1,112 @@
+import functools
+import os
+import sqlite3
+import time
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'sku_barcodes.sqlite')
+
+
+class BarcodeCache:
+    # decoded SKUs keyed by (path, size, mtime), so an edited or replaced
+    # file is decoded again; sku is NULL for "no barcode", and such a miss
+    # only holds for the decode settings that produced it, e.g. a miss
+    # without the rotated pass says nothing about a decode with it
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=200000):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_entries = max_entries
+        self.db = sqlite3.connect(path)
+        self.db.execute('''CREATE TABLE IF NOT EXISTS barcodes (
+                           path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER,
+                           sku TEXT, used REAL, settings TEXT)''')
+        columns = [row[1] for row in self.db.execute('PRAGMA table_info(barcodes)')]
+        if 'settings' not in columns:
+            # misses cached before settings were kept are decoded again
+            self.db.execute('ALTER TABLE barcodes ADD COLUMN settings TEXT')
+        self.db.execute('CREATE INDEX IF NOT EXISTS barcodes_used ON barcodes (used)')
+        self.db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    @staticmethod
+    def key(file):
+        st = os.stat(file)
+        return os.path.abspath(file), st.st_size, st.st_mtime_ns
+
+    def get_many(self, file_names, settings=''):
+        # {file: sku or None} for the files with an up-to-date entry;
+        # settings: see decode_settings in sorting_scripts
+        found = {}
+        now = time.time()
+        for file in file_names:
+            try:
+                path, size, mtime = self.key(file)
+            except OSError:
+                continue
+            row = self.db.execute('''SELECT sku FROM barcodes WHERE path = ? AND size = ? AND mtime = ?
+                                     AND (sku IS NOT NULL OR settings = ?)''',
+                                  (path, size, mtime, settings)).fetchone()
+            if row:
+                found[file] = row[0]
+                self.db.execute('UPDATE barcodes SET used = ? WHERE path = ?', (now, path))
+        self.db.commit()
+        return found
+
+    def put_many(self, items, settings=''):
+        # items: (file, sku or None) pairs, decoded with settings
+        now = time.time()
+        rows = []
+        for file, sku in items:
+            try:
+                rows.append(self.key(file) + (sku, now, None if sku else settings))
+            except OSError:
+                continue
+        self.db.executemany('INSERT OR REPLACE INTO barcodes VALUES (?, ?, ?, ?, ?, ?)', rows)
+        self.db.commit()
+        self.evict()
+
+    def put(self, file, sku, settings=''):
+        self.put_many([(file, sku)], settings)
+
+    def evict(self, max_entries=None):
+        # drop the least recently used entries beyond max_entries
+        if max_entries is None:
+            max_entries = self.max_entries
+        count = self.db.execute('SELECT COUNT(*) FROM barcodes').fetchone()[0]
+        if count > max_entries:
+            self.db.execute('''DELETE FROM barcodes WHERE path IN
+                               (SELECT path FROM barcodes ORDER BY used LIMIT ?)''',
+                            (count - max_entries,))
+            self.db.commit()
+
+    def invalidate(self, file_names=None):
+        # forget the given files, or everything
+        if file_names is None:
+            self.db.execute('DELETE FROM barcodes')
+        else:
+            self.db.executemany('DELETE FROM barcodes WHERE path = ?',
+                                [(os.path.abspath(file),) for file in file_names])
+        self.db.commit()
+
+
+@functools.lru_cache(maxsize=None)
+def default_cache():
+    return BarcodeCache()
+
+
+def resolve_cache(cache):
+    # True: the shared default cache; a str: a cache at that path;
+    # None or False: no cache
+    if cache is True:
+        return default_cache()
+    if isinstance(cache, str):
+        return BarcodeCache(cache)
+    return cache or None
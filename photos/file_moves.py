@@ -0,0 +1,185 @@
+import errno
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# the journal of the sort in progress, and of the last one that finished
+JOURNAL = '.sort_journal.jsonl'
+LAST_JOURNAL = '.sort_journal.last.jsonl'
+
+
+def plan_moves(groups, dest_dir):
+    # groups: {sku: [files]} -> [(src, dst)], one folder per SKU
+    moves = []
+    for sku, files in groups.items():
+        folder = os.path.join(dest_dir, sku.upper())
+        for file in files:
+            moves.append((file, os.path.join(folder, os.path.basename(file))))
+
+    return moves
+
+
+def read_journal(path):
+    # planned moves in order, the set of those done, and the set of
+    # cross-device moves whose copy is complete
+    planned = []
+    done = set()
+    copied = set()
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break  # torn last line of an interrupted write
+            move = (entry['src'], entry['dst'])
+            if entry['op'] == 'plan':
+                planned.append(move)
+            elif entry['op'] == 'copied':
+                copied.add(move)
+            else:
+                done.add(move)
+
+    return planned, done, copied
+
+
+def copy_move(src, dst, record=None):
+    # across filesystems: copy to a temporary name, rename into place,
+    # journal that the copy is complete, then remove the source, so dst
+    # is never half-written and src is only removed once dst is whole
+    part = dst + '.part'
+    shutil.copy2(src, part)
+    os.replace(part, dst)
+    if record:
+        record(src, dst, 'copied')
+    os.remove(src)
+    return os.path.getsize(dst)
+
+
+def finished(src, dst, copied):
+    # whether a move was carried out but not journaled before a crash:
+    # a rename took src away, or a journaled copy left src behind; an
+    # unrelated file at dst is never taken for a finished move
+    if not os.path.exists(dst):
+        return False
+    if not os.path.exists(src):
+        return True
+    if (src, dst) in copied:
+        os.remove(src)
+        return True
+    return False
+
+
+def run_moves(moves, journal=None, done=(), workers=4, copied=None):
+    # moves not in done are renamed where possible; cross-device moves
+    # are copied by a thread pool; each success is journaled; copied
+    # (the journal's completed copies) also checks for moves made before
+    # a crash but not journaled
+    failures = []
+    moved = 0
+    nbytes = 0
+
+    for folder in sorted({os.path.dirname(dst) for src, dst in moves}):
+        os.makedirs(folder, exist_ok=True)
+
+    lock = threading.Lock()
+
+    def record(src, dst, op='done'):
+        if journal is None:
+            return
+        with lock:
+            journal.write(json.dumps({'op': op, 'src': src, 'dst': dst}) + '\n')
+            journal.flush()
+            if op == 'copied':
+                os.fsync(journal.fileno())
+
+    with ThreadPoolExecutor(workers) as pool:
+        copies = []
+        for src, dst in moves:
+            if (src, dst) in done:
+                continue
+            try:
+                if copied is not None and finished(src, dst, copied):
+                    record(src, dst)
+                    continue
+                if os.path.exists(dst):
+                    raise FileExistsError(errno.EEXIST, "Destination exists", dst)
+                os.rename(src, dst)
+            except OSError as e:
+                if e.errno == errno.EXDEV:
+                    copies.append((src, dst, pool.submit(copy_move, src, dst, record)))
+                else:
+                    failures.append((src, dst, e))
+                continue
+            nbytes += os.path.getsize(dst)
+            moved += 1
+            record(src, dst)
+
+        for src, dst, future in copies:
+            try:
+                nbytes += future.result()
+            except OSError as e:
+                failures.append((src, dst, e))
+                continue
+            moved += 1
+            record(src, dst)
+
+    if journal is not None:
+        os.fsync(journal.fileno())
+    return moved, nbytes, failures
+
+
+def move_files(groups, dest_dir, workers=4):
+    # move {sku: [files]} into dest_dir/SKU/, journaled in dest_dir;
+    # an earlier interrupted sort into dest_dir is finished first
+    os.makedirs(dest_dir, exist_ok=True)
+    resumed = resume_moves(dest_dir, workers)
+
+    moves = plan_moves(groups, dest_dir)
+    path = os.path.join(dest_dir, JOURNAL)
+    with open(path, 'w') as journal:
+        journal.write(''.join(json.dumps({'op': 'plan', 'src': src, 'dst': dst}) + '\n'
+                              for src, dst in moves))
+        journal.flush()
+        os.fsync(journal.fileno())
+        moved, nbytes, failures = run_moves(moves, journal, workers=workers)
+
+    # only an interrupted sort leaves JOURNAL behind; failures are returned
+    os.replace(path, os.path.join(dest_dir, LAST_JOURNAL))
+
+    return moved + resumed[0], nbytes + resumed[1], resumed[2] + failures
+
+
+def resume_moves(dest_dir, workers=4):
+    # finish the moves of an interrupted sort into dest_dir, if any
+    path = os.path.join(dest_dir, JOURNAL)
+    if not os.path.exists(path):
+        return 0, 0, []
+
+    planned, done, copied = read_journal(path)
+    with open(path, 'a') as journal:
+        moved, nbytes, failures = run_moves(planned, journal, done, workers, copied)
+
+    os.replace(path, os.path.join(dest_dir, LAST_JOURNAL))
+
+    return moved, nbytes, failures
+
+
+def rollback_moves(dest_dir, workers=4):
+    # move back what the interrupted sort into dest_dir (or, if there is
+    # none, the last finished one) journaled as done, newest first
+    path = os.path.join(dest_dir, JOURNAL)
+    if not os.path.exists(path):
+        path = os.path.join(dest_dir, LAST_JOURNAL)
+    if not os.path.exists(path):
+        return 0, 0, []
+
+    planned, done, copied = read_journal(path)
+    back = [(dst, src) for src, dst in reversed(planned) if (src, dst) in done]
+    moved, nbytes, failures = run_moves(back, workers=workers)
+
+    if not failures:
+        os.remove(path)
+
+    return moved, nbytes, failures
@@ -0,0 +1,111 @@
+import json
+import os
+import time
+
+from PIL import Image
+
+IMAGE_TYPES = ('.jpg', '.jpeg', '.png', '.tif', '.tiff')
+INDEX_FILE = '.photo_index.json'
+
+EXIF_IFD = 0x8769
+DATETIME = 306
+DATETIME_ORIGINAL = 36867
+SUBSEC_ORIGINAL = 37521
+
+
+def capture_time(path):
+    # EXIF DateTimeOriginal (and its sub-seconds, for bursts) as a sortable
+    # string, e.g. '2024:05:01 10:22:31.45'; Image.open only parses the
+    # headers, the pixels are never decoded; if there is none, the file's
+    # mtime in the same format, so those files sort on the same timeline
+    try:
+        with Image.open(path) as im:
+            exif = im.getexif()
+            sub = exif.get_ifd(EXIF_IFD)
+            stamp = sub.get(DATETIME_ORIGINAL) or exif.get(DATETIME)
+            subsec = sub.get(SUBSEC_ORIGINAL)
+    except (OSError, ValueError, SyntaxError):
+        stamp = None
+    if not isinstance(stamp, str) or not stamp.strip('\x00 '):
+        return mtime_stamp(path)
+
+    stamp = stamp.strip('\x00 ')
+    if isinstance(subsec, str) and subsec.strip('\x00 '):
+        stamp += '.' + subsec.strip('\x00 ')
+    return stamp
+
+
+def mtime_stamp(path):
+    # local time, as cameras write EXIF times
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return ''
+    return time.strftime('%Y:%m:%d %H:%M:%S', time.localtime(mtime))
+
+
+def index_directory(directory, use_cache=True):
+    # {name: [size, mtime_ns, capture time]} for the images in directory;
+    # the index is kept in directory/INDEX_FILE and only new or changed
+    # files are read again
+    path = os.path.join(directory, INDEX_FILE)
+    old = {}
+    if use_cache:
+        try:
+            with open(path) as f:
+                old = json.load(f)
+        except (OSError, ValueError):
+            old = {}
+
+    index = {}
+    with os.scandir(directory) as it:
+        for entry in it:
+            if not entry.is_file() or not entry.name.lower().endswith(IMAGE_TYPES):
+                continue
+            st = entry.stat()
+            known = old.get(entry.name)
+            # '' is from before capture_time fell back to the mtime
+            if known and known[:2] == [st.st_size, st.st_mtime_ns] and known[2]:
+                index[entry.name] = known
+            else:
+                index[entry.name] = [st.st_size, st.st_mtime_ns, capture_time(entry.path)]
+
+    if use_cache and index != old:
+        try:
+            with open(path + '.part', 'w') as f:
+                json.dump(index, f)
+            os.replace(path + '.part', path)
+        except OSError:
+            pass  # read-only folder, index again next time
+
+    return index
+
+
+def capture_key(index, name):
+    # files taken in the same second (or without sub-seconds) sort by mtime
+    size, mtime, taken = index[name]
+    return taken, mtime, name
+
+
+def index_photos(directory, use_cache=True):
+    # paths of the images in directory, in capture order
+    index = index_directory(directory, use_cache)
+    return [os.path.join(directory, name)
+            for name in sorted(index, key=lambda name: capture_key(index, name))]
+
+
+def capture_order(file_names, use_cache=True):
+    # file_names sorted by capture time, one index per directory
+    indexes = {}
+    keys = {}
+    for file in file_names:
+        directory, name = os.path.split(file)
+        if directory not in indexes:
+            indexes[directory] = index_directory(directory or '.', use_cache)
+        index = indexes[directory]
+        if name not in index:
+            st = os.stat(file)
+            index[name] = [st.st_size, st.st_mtime_ns, capture_time(file)]
+        keys[file] = capture_key(index, name)
+
+    return sorted(file_names, key=keys.__getitem__)
@@ -0,0 +1,75 @@
+import collections
+import contextlib
+import json
+import time
+
+
+class SortMetrics:
+    # per-stage timers and counters of a sort: stages are 'index',
+    # 'open' (PIL open and scaling), 'decode' (pyzbar), 'match' (SKU
+    # regex) and 'move'; decode times are summed over the workers, so
+    # with a pool they can exceed the elapsed time; decode_hits counts
+    # the stages of sorting_scripts.stage_hits
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.seconds = collections.Counter()
+        self.calls = collections.Counter()
+        self.counts = collections.Counter()
+        self.decode_hits = collections.Counter()
+        self.failures = collections.Counter()
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def add_time(self, stage, seconds, calls=1):
+        self.seconds[stage] += seconds
+        self.calls[stage] += calls
+
+    def merge_times(self, timings):
+        # {stage: (seconds, calls)}, as collected by a worker
+        for stage, (seconds, calls) in timings.items():
+            self.add_time(stage, seconds, calls)
+
+    def fail(self, error):
+        # an exception or the name of its type
+        name = error if isinstance(error, str) else type(error).__name__
+        self.failures[name] += 1
+
+    def as_dict(self):
+        elapsed = time.perf_counter() - self.started
+        images = self.counts['images']
+        decoded = sum(self.decode_hits.values())
+        found = decoded - sum(self.decode_hits[stage] for stage in ('miss', 'cached_miss', 'error'))
+        return {
+            'elapsed': elapsed,
+            'images': images,
+            'images_per_sec': images / elapsed if elapsed else 0.,
+            'stages': {stage: {'seconds': self.seconds[stage], 'calls': self.calls[stage]}
+                       for stage in self.seconds},
+            'decode_hits': dict(self.decode_hits),
+            'decode_hit_rate': found / decoded if decoded else 0.,
+            'counts': dict(self.counts),
+            'failures': dict(self.failures),
+        }
+
+    def dump(self, path=None):
+        text = json.dumps(self.as_dict(), indent=1)
+        if path:
+            with open(path, 'w') as f:
+                f.write(text + '\n')
+        return text
+
+
+def add_time(timings, stage, start):
+    # for code without a SortMetrics at hand, e.g. in a pool worker:
+    # timings is a {stage: [seconds, calls]} dict, or None to not time
+    if timings is not None:
+        entry = timings.setdefault(stage, [0., 0])
+        entry[0] += time.perf_counter() - start
+        entry[1] += 1
@@ -1,79 +1,236 @@
+import collections
+import functools
 import os
 import re
-import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 from PIL import Image
 from PyQt5.QtWidgets import QApplication, QFileDialog
 from pyzbar.pyzbar import decode, ZBarSymbol
 
+from photos.barcode_cache import resolve_cache
+from photos.file_moves import move_files
+from photos.photo_index import capture_order
+from photos.sort_metrics import SortMetrics, add_time
 
-def find_sku_barcode(file):
-    form = re.compile(r"\D{2}\d{4}")
 
+SKU_FORM = re.compile(r"\D{2}\d{4}")
+SYMBOLS = [ZBarSymbol.CODE39, ZBarSymbol.CODE128]
+
+# reduced scales tried before full resolution, smallest first
+DECODE_SCALES = (4, 2)
+
+# how often each decode stage found the SKU ('1/4', '1/2', 'full',
+# 'rotated') or nothing ('miss'), or the cache answered with a SKU
+# ('cached') or a miss ('cached_miss'), or the file could not be read
+# ('error'), for tuning DECODE_SCALES
+stage_hits = collections.Counter()
+
+
+def cached_stage(sku):
+    return 'cached' if sku else 'cached_miss'
+
+
+def decode_sku(im, timings=None):
+    start = time.perf_counter()
+    results = decode(im, symbols=SYMBOLS)
+    add_time(timings, 'decode', start)
+
+    start = time.perf_counter()
     sku = None
-    im = Image.open(file)
-    results = decode(im, symbols=[ZBarSymbol.CODE39, ZBarSymbol.CODE128])
-    if results:
-        if form.match(results[0].data.decode()):
-            sku = results[0].data.decode()
-        else:
-            sku = None
-    else:
-        sku = None
+    for result in results:
+        data = result.data.decode()
+        if SKU_FORM.match(data):
+            sku = data
+            break
+    add_time(timings, 'match', start)
 
     return sku
 
-def manual_sort(dest_dir, file_names):
 
-    sku = input("Enter SKU: ").upper()
+def find_sku_barcode_stage(file, scales=DECODE_SCALES, rotate=False, timings=None):
+    # JPEGs are first decoded straight at reduced scale with draft();
+    # other formats have no cheap reduced decode, so they go straight to
+    # full resolution; zbar scans both axes, so rotate rarely helps
+    for scale in scales:
+        start = time.perf_counter()
+        with Image.open(file) as im:
+            if im.format != 'JPEG':
+                break
+            size = (max(im.width // scale, 1), max(im.height // scale, 1))
+            im.draft('L', size)
+            small = im.convert('L')
+        small.thumbnail(size)
+        add_time(timings, 'open', start)
+        sku = decode_sku(small, timings)
+        if sku:
+            return sku, '1/' + str(scale)
 
+    start = time.perf_counter()
+    with Image.open(file) as im:
+        full = im.convert('L')
+    add_time(timings, 'open', start)
+    sku = decode_sku(full, timings)
+    if sku:
+        return sku, 'full'
+    if rotate:
+        sku = decode_sku(full.transpose(Image.Transpose.ROTATE_90), timings)
+        if sku:
+            return sku, 'rotated'
+
+    return None, 'miss'
+
+
+def decode_file(file, scales=DECODE_SCALES, rotate=False):
+    # find_sku_barcode_stage in a pool worker, also returning its stage
+    # timings and the type of the error if the file could not be read
+    timings = {}
     try:
-        os.mkdir(dest_dir+sku)
-    except:
-        pass
+        sku, stage = find_sku_barcode_stage(file, scales, rotate, timings)
+    except Exception as e:
+        return None, 'error', timings, type(e).__name__
+
+    return sku, stage, timings, None
+
+
+def decode_settings(scales=DECODE_SCALES, rotate=False):
+    # what a cached miss was decoded with, e.g. '4,2' or '4,2+rotated'
+    return ','.join(map(str, scales)) + ('+rotated' if rotate else '')
+
+
+def find_sku_barcode(file, cache=None):
+    cache = resolve_cache(cache)
+    if cache:
+        found = cache.get_many([file], decode_settings())
+        if file in found:
+            stage_hits[cached_stage(found[file])] += 1
+            return found[file]
+
+    sku, stage = find_sku_barcode_stage(file)
+    stage_hits[stage] += 1
+    if cache:
+        cache.put(file, sku, decode_settings())
+
+    return sku
 
-    for file in file_names:
-        try:
-            shutil.move(file, dest_dir + sku + "/" + file.split('/')[-1])
-        except:
-            pass
+
+def stage_hit_rates():
+    total = sum(stage_hits.values())
+    if not total:
+        return {}
+    return {stage: count / total for stage, count in stage_hits.items()}
+
+def report_moves(moved, nbytes, failures):
+    print("Images Moved: ", moved, "(" + str(round(nbytes / 2 ** 20, 1)) + " MB)")
+    for src, dst, e in failures:
+        print("Failed:", src, "->", dst, e)
+
+
+def manual_sort(dest_dir, file_names):
+
+    sku = input("Enter SKU: ").upper()
+
+    report_moves(*move_files({sku: file_names}, dest_dir))
 
     return
 
-def basic_auto_sort(dest_dir, file_names):
+def basic_auto_sort(dest_dir, file_names, cache=True, order=True):
+    cache = resolve_cache(cache)
+    if order:
+        file_names = capture_order(file_names)
     match = False
     for file in reversed(file_names):
-        sku = find_sku_barcode(file)
+        sku = find_sku_barcode(file, cache)
         if sku:
             match = True
             break
     if match == False:
         sku = input("Barcode not found. Enter SKU: ")
 
+    print(sku.upper())
+    report_moves(*move_files({sku: file_names}, dest_dir))
+
+    return
+
+
+def decode_skus(file_names, nproc=None, chunksize=8, scales=DECODE_SCALES, rotate=False,
+                cache=True, metrics=None):
+    # find_sku_barcode over file_names in a process pool, yielded in order;
+    # cached files are answered here and only the rest are sent to the
+    # workers; stage_hits is counted here, the workers' copies are not seen
+    cache = resolve_cache(cache)
+    settings = decode_settings(scales, rotate)
+    found = cache.get_many(file_names, settings) if cache else {}
+    todo = [file for file in file_names if file not in found]
+
+    find = functools.partial(decode_file, scales=scales, rotate=rotate)
+    pool = None
+    if nproc == 1 or len(todo) <= 1:
+        results = map(find, todo)
+    else:
+        pool = ProcessPoolExecutor(nproc)
+        results = pool.map(find, todo, chunksize=chunksize)
+
+    decoded = []
     try:
-        print(sku.upper())
-        try:
-            os.mkdir(dest_dir + sku.upper())
-        except Exception as e:
-            print(e)
-            pass
         for file in file_names:
-            shutil.move(file, dest_dir + sku.upper() + "/" + file.split('/')[-1])
-    except Exception as e:
-        print(e)
-        pass
+            if file in found:
+                stage = cached_stage(found[file])
+                stage_hits[stage] += 1
+                if metrics:
+                    metrics.decode_hits[stage] += 1
+                yield found[file]
+                continue
+            sku, stage, timings, error = next(results)
+            stage_hits[stage] += 1
+            if metrics:
+                metrics.decode_hits[stage] += 1
+                metrics.merge_times(timings)
+            if error:
+                print("Unreadable:", file, error)
+                if metrics:
+                    metrics.fail(error)
+                yield None
+                continue
+            decoded.append((file, sku))
+            if cache and len(decoded) >= 64:
+                cache.put_many(decoded, settings)
+                decoded = []
+            yield sku
+    finally:
+        if cache:
+            cache.put_many(decoded, settings)
+        if pool:
+            pool.shutdown(cancel_futures=True)
 
-    return
 
+def print_progress(done, total, last, interval=1.0):
+    # print at most once per interval seconds, and at the end
+    now = time.monotonic()
+    if done == total or now - last >= interval:
+        print("Images Processed: ", str(done) + "/" + str(total))
+        return now
+    return last
 
-def bulk_auto_sort(dest_dir, file_names):
+
+def bulk_auto_sort(dest_dir, file_names, nproc=None, cache=True, order=True, metrics_file=None):
+    # order: group by EXIF capture time rather than the order given;
+    # stage timings and counters are saved as JSON to metrics_file
+    # (default: dest_dir/.sort_metrics.json) and returned
+    metrics = SortMetrics()
     skus = {}
     current_sku = 'NO_SKU'
     skus[current_sku] = []
 
-    for i, file in enumerate(reversed(file_names)):
-        print("Images Processed: ", str(i + 1) + "/" + str(len(file_names)))
-        sku = find_sku_barcode(file)
+    with metrics.timer('index'):
+        files = list(reversed(capture_order(file_names) if order else file_names))
+    total = len(files)
+    metrics.counts['images'] = total
+    last = 0.
+    for i, (file, sku) in enumerate(zip(files, decode_skus(files, nproc, cache=cache,
+                                                           metrics=metrics))):
+        last = print_progress(i + 1, total, last)
         if sku:
             current_sku = sku
             if sku not in skus.keys():
@@ -82,24 +239,30 @@ def bulk_auto_sort(dest_dir, file_names):
                 pass
         skus[current_sku].append(file)
 
-    for sku in skus.keys():
-        try:
-            os.mkdir(dest_dir + sku.upper())
-        except:
-            pass
-        for file in skus[sku]:
-            try:
-                shutil.move(file, dest_dir + current_sku.upper() + "/" + file.split('/')[-1])
-            except:
-                continue
+    with metrics.timer('move'):
+        moved, nbytes, failures = move_files(skus, dest_dir)
+    metrics.counts['skus'] = len(skus)
+    metrics.counts['moved'] = moved
+    metrics.counts['bytes_moved'] = nbytes
+    for src, dst, e in failures:
+        metrics.fail(e)
 
     print("\nSKUs Found: ", len(skus.keys()))
     print("Total Images: ", len(file_names))
     print("")
     for sku in skus.keys():
         print("SKU:", sku, "Images:", len(skus[sku]))
+    print("")
+    report_moves(moved, nbytes, failures)
+    summary = metrics.as_dict()
+    print("Images/sec: ", round(summary['images_per_sec'], 1),
+          " Decode hit rate: ", round(summary['decode_hit_rate'], 3))
 
-    return
+    if metrics_file is None:
+        metrics_file = os.path.join(dest_dir, '.sort_metrics.json')
+    metrics.dump(metrics_file)
+
+    return metrics
 
 
 def photo_pick_dialogs():
@@ -0,0 +1,125 @@
+import argparse
+import collections
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from photos.barcode_cache import resolve_cache
+from photos.file_moves import move_files
+from photos.photo_index import IMAGE_TYPES, capture_time
+from photos.sorting_scripts import cached_stage, decode_file, decode_settings, report_moves, stage_hits
+
+
+def settled_files(source_dir, state, settle, queued):
+    # new images in source_dir whose size and mtime have not changed for
+    # settle seconds (the camera or card reader is done writing them),
+    # in capture order; state remembers (size, mtime, since) between polls
+    now = time.monotonic()
+    present = set()
+    settled = []
+    with os.scandir(source_dir) as it:
+        for entry in it:
+            if not entry.is_file() or not entry.name.lower().endswith(IMAGE_TYPES):
+                continue
+            path = entry.path
+            present.add(path)
+            if path in queued:
+                continue
+            st = entry.stat()
+            key = (st.st_size, st.st_mtime_ns)
+            if path not in state or state[path][0] != key:
+                state[path] = (key, now)
+            elif now - state[path][1] >= settle:
+                settled.append((capture_time(path), st.st_mtime_ns, entry.name, path))
+
+    for path in list(state):
+        if path not in present:
+            del state[path]
+    settled.sort()
+    for taken, mtime, name, path in settled:
+        del state[path]
+
+    return [path for taken, mtime, name, path in settled]
+
+
+def watch_sort(source_dir, dest_dir, interval=2., settle=3., nproc=2, cache=True, stop=None):
+    # sort photos as they land in source_dir: each barcode shot closes
+    # the group of photos taken before it, which is moved to its SKU
+    # folder straight away; photos after the last barcode shot wait in
+    # source_dir; runs until stop (a threading.Event) is set
+    cache = resolve_cache(cache)
+    if stop is None:
+        stop = threading.Event()
+
+    state = {}
+    queued = set()
+    waiting = collections.deque()
+    inflight = collections.deque()
+    group = []
+    sorted_count = 0
+
+    with ProcessPoolExecutor(nproc) as pool:
+        while not stop.is_set():
+            for file in settled_files(source_dir, state, settle, queued):
+                queued.add(file)
+                waiting.append(file)
+
+            # at most 2 decodes per worker at a time
+            while waiting and len(inflight) < 2 * nproc:
+                file = waiting.popleft()
+                found = cache.get_many([file], decode_settings()) if cache else {}
+                if file in found:
+                    inflight.append((file, None, found[file]))
+                else:
+                    inflight.append((file, pool.submit(decode_file, file), None))
+
+            # results in shooting order
+            decoded = []
+            popped = 0
+            while inflight and (inflight[0][1] is None or inflight[0][1].done()):
+                file, future, sku = inflight.popleft()
+                popped += 1
+                if future is None:
+                    stage_hits[cached_stage(sku)] += 1
+                else:
+                    sku, stage, timings, error = future.result()
+                    stage_hits[stage] += 1
+                    if error:
+                        print("Unreadable:", file, error)
+                    else:
+                        decoded.append((file, sku))
+                group.append(file)
+                if sku:
+                    print("SKU:", sku, "Images:", len(group))
+                    moved, nbytes, failures = move_files({sku: group}, dest_dir)
+                    report_moves(moved, nbytes, failures)
+                    # failed files stay queued, or they would be retried forever
+                    queued.difference_update(set(group) - {src for src, dst, e in failures})
+                    sorted_count += moved
+                    group = []
+            if cache and decoded:
+                cache.put_many(decoded, decode_settings())
+
+            if not popped:
+                stop.wait(min(interval, 0.05) if inflight else interval)
+
+    print("Images Sorted: ", sorted_count, "Waiting for a barcode: ", len(group))
+
+    return sorted_count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sort photos into SKU folders as they are shot.")
+    parser.add_argument('source_dir')
+    parser.add_argument('dest_dir')
+    parser.add_argument('--interval', type=float, default=2., help="seconds between polls")
+    parser.add_argument('--settle', type=float, default=3.,
+                        help="seconds a file must be unchanged before it is read")
+    parser.add_argument('--nproc', type=int, default=2)
+    args = parser.parse_args()
+
+    try:
+        watch_sort(args.source_dir, args.dest_dir, args.interval, args.settle, args.nproc)
+    except KeyboardInterrupt:
+        pass